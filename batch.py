@@ -0,0 +1,279 @@
+# batch.py
+"""Headless batch generation of contracts from CSV/XLSX customer lists."""
+
+import csv
+import os
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook
+
+from config import BATCH_SETTINGS, POSTAL_CODES
+from contract_batch import ContractBatch
+from contract_data import ContractManager
+from documents import ContentManifest, content_hash, save_document
+from instrumentation import count, stage
+from layout import contract_dir, output_layout
+from registry_query import RegistryQuery
+from template_cache import TemplateCache
+
+# Registry headers accepted as input columns, mapped to template variable names
+INPUT_COLUMNS = {
+    'Data umowy': 'data',
+    'Gmina': 'gmina',
+    'Nazwa/Imię i nazwisko': 'nazwa',
+    'NIP': 'nip',
+    'Kod pocztowy': 'kod_pocztowy',
+    'Miasto': 'miasto',
+    'Miejscowość': 'miejscowosc',
+    'Ulica': 'ulica',
+    'Numer domu': 'numer_domu',
+    'Email': 'email',
+    'Telefon': 'tel',
+    'EKO': 'is_eco',
+}
+
+
+def iter_customers(input_path: str) -> Iterator[dict]:
+    """Yield customer rows from a CSV or XLSX file one at a time, keyed by template variable names."""
+    if input_path.lower().endswith(('.xlsx', '.xlsm')):
+        wb = load_workbook(input_path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, ())
+            for row in rows:
+                if any(cell is not None for cell in row):
+                    yield _normalize_record(dict(zip(header, row)))
+        finally:
+            wb.close()
+        return
+
+    with open(input_path, newline='', encoding='utf-8-sig') as csv_file:
+        sample = csv_file.read(4096)
+        csv_file.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        for row in csv.DictReader(csv_file, dialect=dialect):
+            if any(row.values()):
+                yield _normalize_record(row)
+
+
+def _normalize_record(record: dict) -> dict:
+    """Map input headers to template keys and cell values to stripped strings."""
+    values = {}
+    for header, value in record.items():
+        if header is None:
+            continue
+        header = str(header).strip()
+        key = INPUT_COLUMNS.get(header, header.lower())
+        values[key] = "" if value is None else str(value).strip()
+
+    if not values.get("miasto") and values.get("kod_pocztowy"):
+        values["miasto"] = POSTAL_CODES.get(values["kod_pocztowy"], "")
+    return values
+
+
+def load_contracts(records: Iterable[dict], default_date: str = "") -> Tuple[ContractBatch, List[Tuple[int, str]]]:
+    """Build and validate contract data for every row.
+
+    Returns a batch of the valid rows and a list of (row number, message)
+    errors, with row numbers counted as in the input file (header is row 1).
+    """
+    contracts = ContractBatch.from_records(records, default_date)
+    report = contracts.validate(first_row=2)
+    errors = [(issue.row, f"{issue.field}: {issue.message}") for issue in report.issues]
+    invalid_rows = report.invalid_rows
+    if invalid_rows:
+        contracts = contracts.select(index for index in range(len(contracts)) if index + 2 not in invalid_rows)
+    return contracts, errors
+
+
+def generate_batch(contracts: ContractBatch, template_path: str, contracts_dir: str,
+                   excel_path: str, year: str, workers: int = 1) -> List[str]:
+    """Render all contracts, then append the registry once.
+
+    Contracts written before a failure are still added to the registry and
+    numbers of contracts that were not written are given back. Returns the
+    paths of the written documents.
+    """
+    with stage("numbering"):
+        contracts.allocate_numbers(contracts_dir, year, excel_path)
+    layout = output_layout(contracts_dir)
+    folders = {gmina: contract_dir(contracts_dir, year, gmina, layout) for gmina in set(contracts.columns['gmina'])}
+    for folder in set(folders.values()):
+        os.makedirs(folder, exist_ok=True)
+    output_paths = contracts.output_paths(folders)
+
+    # Filled as documents are saved, so it is complete even when rendering is interrupted
+    written_rows = []
+    try:
+        with stage("render"):
+            _, error = render_jobs(contracts.template_contexts(), output_paths, template_path, workers,
+                                   on_written=lambda index, digest: written_rows.append(index))
+    finally:
+        written_rows.sort()
+        written = set(written_rows)
+        contracts.release_numbers(contracts_dir, [index in written for index in range(len(contracts))],
+                                  excel_path)
+        if written_rows:
+            with stage("registry"):
+                contracts.append_to_registry(excel_path, written_rows)
+                ContractManager.flush_registry(excel_path)
+
+    if error is not None:
+        raise error
+    return [output_paths[index] for index in written_rows]
+
+
+def rerender_contracts(template_path: str, contracts_dir: str, excel_path: str, year: str,
+                       gmina: str = None, workers: int = 1) -> Tuple[int, int]:
+    """Render the registered contracts of a year again with the current template.
+
+    Contracts keep their numbers and file names. Documents already rendered
+    from the current template and data are skipped, so a run that was
+    interrupted, or one started after another template change, only renders
+    what is missing. Returns the number of rendered and unchanged documents.
+    """
+    with stage("registry"):
+        contracts = ContractBatch.from_registry_rows(
+            ContractManager.query_registry(excel_path, RegistryQuery(year=year, gmina=gmina)), year)
+    if not len(contracts):
+        return 0, 0
+
+    layout = output_layout(contracts_dir)
+    folders = {gmina: contract_dir(contracts_dir, year, gmina, layout) for gmina in set(contracts.columns['gmina'])}
+    for folder in set(folders.values()):
+        os.makedirs(folder, exist_ok=True)
+    output_paths = contracts.output_paths(folders)
+
+    # Snapshot; the manifest cache is updated while rendering
+    known_hashes = {}
+    for folder in set(folders.values()):
+        known_hashes.update(ContentManifest(folder).hashes())
+
+    with stage("render"):
+        written, error = render_jobs(contracts.template_contexts(), output_paths, template_path, workers)
+    if error is not None:
+        raise error
+
+    unchanged = sum(1 for output_path, digest in zip(output_paths, written)
+                    if digest == known_hashes.get(os.path.basename(output_path)))
+    return len(written) - unchanged, unchanged
+
+
+def render_jobs(contexts: Sequence[dict], output_paths: List[str], template_path: str, workers: int = 1,
+                on_written: Callable[[int, str], None] = None) -> Tuple[List[Optional[str]], Optional[Exception]]:
+    """Render contracts skipping unchanged files and record new content hashes per output folder.
+
+    Hashes are recorded every BATCH_SETTINGS["manifest_every"] documents, so
+    a run that is interrupted skips the finished documents when started again.
+    ``on_written`` is called as in render_contracts.
+    """
+    manifests = {folder: ContentManifest(folder) for folder in {os.path.dirname(path) for path in output_paths}}
+    known_hashes = {}
+    for manifest in manifests.values():
+        known_hashes.update(manifest.hashes())
+
+    new_hashes: Dict[str, Dict[str, str]] = {}
+
+    def record_new():
+        for folder, hashes in new_hashes.items():
+            manifests[folder].record(hashes)
+        new_hashes.clear()
+
+    def record_written(index: int, digest: str):
+        if on_written is not None:
+            on_written(index, digest)
+        filename = os.path.basename(output_paths[index])
+        if known_hashes.get(filename) != digest:
+            new_hashes.setdefault(os.path.dirname(output_paths[index]), {})[filename] = digest
+            if sum(map(len, new_hashes.values())) >= BATCH_SETTINGS["manifest_every"]:
+                record_new()
+
+    try:
+        return render_contracts(contexts, output_paths, template_path, workers, known_hashes, record_written)
+    finally:
+        record_new()
+
+
+def render_contracts(contexts: Sequence[dict], output_paths: List[str], template_path: str, workers: int = 1,
+                     known_hashes: Dict[str, str] = None, on_written: Callable[[int, str], None] = None
+                     ) -> Tuple[List[Optional[str]], Optional[Exception]]:
+    """Render and save the template data of each output path, in a process pool when workers > 1.
+
+    ``contexts`` may build template data on access; only a few jobs per
+    worker are in flight at a time. Files whose content hash in
+    ``known_hashes`` matches are left as they are; ``on_written`` is called
+    with the index and content hash of every finished job. Stops at the first
+    failure and returns the content hash of every job in job order (None
+    when not written), together with that failure.
+    """
+    known_hashes = known_hashes or {}
+    written: List[Optional[str]] = [None] * len(output_paths)
+    if workers <= 1:
+        _init_worker(template_path)
+        for index, output_path in enumerate(output_paths):
+            try:
+                written[index], size = _render_job(contexts[index], output_path,
+                                                   known_hashes.get(os.path.basename(output_path)))
+            except Exception as e:
+                return written, e
+            count("bytes_written", size)
+            if on_written is not None:
+                on_written(index, written[index])
+        return written, None
+
+    error = None
+    pending = {}
+    submitted = 0
+    window = workers * BATCH_SETTINGS["jobs_per_worker"]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(template_path,)) as executor:
+        for index in range(len(output_paths)):
+            while error is None and submitted < len(output_paths) and submitted - index < window:
+                output_path = output_paths[submitted]
+                pending[submitted] = executor.submit(_render_job, contexts[submitted], output_path,
+                                                     known_hashes.get(os.path.basename(output_path)))
+                submitted += 1
+            future = pending.pop(index, None)
+            if future is None:
+                break
+            try:
+                written[index], size = future.result()
+            except CancelledError:
+                continue
+            except Exception as e:
+                if error is None:
+                    error = e
+                    for queued in pending.values():
+                        queued.cancel()
+                continue
+            # Workers have no trace of their own, so their bytes are counted here
+            count("bytes_written", size)
+            if on_written is not None:
+                on_written(index, written[index])
+    return written, error
+
+
+# Template cache of the current process, warmed once per pool worker
+_worker_cache: Optional[TemplateCache] = None
+_worker_template: str = ""
+
+
+def _init_worker(template_path: str):
+    """Load the template once in a rendering process."""
+    global _worker_cache, _worker_template
+    _worker_cache = TemplateCache()
+    _worker_template = template_path
+    _worker_cache.get(template_path)
+
+
+def _render_job(template_data: dict, output_path: str, known_hash: str = None) -> Tuple[str, int]:
+    """Render one contract with the warm template and save it atomically, unless unchanged.
+
+    Returns the content hash and the number of bytes saved, 0 when the file was left as it was.
+    """
+    template = _worker_cache.get(_worker_template)
+    digest = content_hash(template.sha256, template_data)
+    if digest != known_hash or not os.path.isfile(output_path):
+        return digest, save_document(template.render(template_data), output_path)
+    return digest, 0
@@ -0,0 +1,589 @@
+# benchmark.py
+"""Performance benchmarks for the Contract Generator."""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from statistics import mean
+
+from docx import Document
+from docxtpl import DocxTemplate
+from openpyxl import Workbook, load_workbook
+
+from config import REGISTRY_SETTINGS
+from batch import generate_batch
+from contract_batch import ContractBatch
+from contract_data import ContractData, ContractManager
+from generation import ContractWriter
+from instrumentation import PipelineMetrics
+from numbering import CONTRACT_FILE_PATTERN
+from pdf import PDF_CONVERTERS, convert_all, get_converter
+from registry import REGISTRY_COLUMNS, registry_row, stop_background_flushers
+from registry_query import RegistryQuery
+from service import ContractService, ServiceClient
+from template_cache import TemplateCache
+from validators import ContractValidator
+
+
+def sample_template_data(number: int, gmina: str = "GO", year: str = "2024") -> dict:
+    """Build synthetic template data for a single contract."""
+    return {
+        'data': "02.01.2024",
+        'gmina': gmina,
+        'nazwa': f"Klient {number}",
+        'kod_pocztowy': "63-410",
+        'miasto': "Ostrów Wielkopolski",
+        'miejscowosc': "Sobótka",
+        'ulica': "Polna",
+        'numer_domu': str(number % 200 + 1),
+        'email': "-",
+        'tel': "-",
+        'nr': str(number),
+        'rok': year,
+        'nip': "",
+        'is_eco': "nie",
+    }
+
+
+def build_sample_template(template_path: str, paragraphs: int = 60):
+    """Create a synthetic contract template using every template variable."""
+    document = Document()
+    document.add_heading("Umowa nr {{ nr }}/{{ rok }}/{{ gmina }}", level=1)
+    document.add_paragraph("zawarta w dniu {{ data }} pomiędzy firmą a {{ nazwa }} (NIP: {{ nip }}),")
+    document.add_paragraph(
+        "zamieszkałym: {{ kod_pocztowy }} {{ miasto }}, {{ miejscowosc }}, ul. {{ ulica }} {{ numer_domu }}")
+    document.add_paragraph("Kontakt: {{ email }}, tel. {{ tel }}. Odbiór EKO: {{ is_eco }}.")
+
+    table = document.add_table(rows=3, cols=2)
+    for row, (label, value) in enumerate([("Nazwa", "{{ nazwa }}"), ("Adres", "{{ ulica }} {{ numer_domu }}"),
+                                          ("Gmina", "{{ gmina }}")]):
+        table.cell(row, 0).text = label
+        table.cell(row, 1).text = value
+
+    for number in range(1, paragraphs + 1):
+        document.add_paragraph(
+            f"§ {number}. Wykonawca zobowiązuje się do odbioru nieczystości ciekłych z nieruchomości "
+            "{{ nazwa }} położonej w miejscowości {{ miejscowosc }} zgodnie z harmonogramem.")
+    document.save(template_path)
+
+
+def seed_registry(excel_path: str, rows: int):
+    """Create an Excel registry with the given number of synthetic rows."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(REGISTRY_COLUMNS)
+    for number in range(1, rows + 1):
+        data = sample_template_data(number)
+        ws.append([
+            data['data'], f"{number}/2024/GO", data['gmina'], data['nazwa'], data['nip'],
+            data['kod_pocztowy'], data['miasto'], data['miejscowosc'], data['ulica'],
+            data['numer_domu'], data['email'], data['tel'], data['is_eco'], "02.01.2024 12:00",
+        ])
+    wb.save(excel_path)
+
+
+def bench_registry(sizes, contracts: int) -> dict:
+    """Measure save_to_excel per contract and the merge against registries of growing size.
+
+    The journal append stays flat. The merge copies the existing sheet as
+    bytes, so it, and with it the amortized cost per contract, still grows
+    linearly with the registry size, only far more slowly than a cell by
+    cell rewrite.
+    """
+    results = []
+    print(f"{'wiersze':>10} {'zapis [ms]':>12} {'scalenie [s]':>14} {'średnio [ms]':>14}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            excel_path = os.path.join(tmp, "spis_umow_automat.xlsx")
+            seed_registry(excel_path, size)
+
+            # Stay below flush_every so the merge is timed separately
+            timings = []
+            for number in range(size + 1, size + min(contracts, REGISTRY_SETTINGS["flush_every"] - 1) + 1):
+                start = time.perf_counter()
+                ContractManager.save_to_excel(sample_template_data(number), excel_path)
+                timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            ContractManager.flush_registry(excel_path)
+            flush_time = time.perf_counter() - start
+
+            per_contract = mean(timings) * 1000
+            amortized = per_contract + flush_time * 1000 / REGISTRY_SETTINGS["flush_every"]
+            print(f"{size:>10} {per_contract:>12.2f} {flush_time:>14.2f} {amortized:>14.2f}")
+            results.append({"rows": size, "save_ms": per_contract, "flush_s": flush_time,
+                            "amortized_ms": amortized})
+    return {"registry": results}
+
+
+def bench_query(sizes) -> dict:
+    """Measure time and peak memory of a filtered export against registries of growing size."""
+    results = []
+    print(f"{'wiersze':>10} {'eksport [s]':>12} {'pamięć [MB]':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            excel_path = os.path.join(tmp, "spis_umow_automat.xlsx")
+            seed_registry(excel_path, size)
+
+            query = RegistryQuery(year="2024", gmina="GO")
+            export_path = os.path.join(tmp, "eksport.csv")
+            start = time.perf_counter()
+            exported = ContractManager.export_filtered(excel_path, export_path, query)
+            elapsed = time.perf_counter() - start
+
+            # Traced separately, tracemalloc slows the scan down several times
+            tracemalloc.start()
+            ContractManager.export_filtered(excel_path, export_path, query)
+            peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+            tracemalloc.stop()
+
+        print(f"{size:>10} {elapsed:>12.2f} {peak:>12.1f}")
+        results.append({"rows": size, "exported": exported, "export_s": elapsed, "peak_mb": peak})
+    return {"query": results}
+
+
+def bench_template(renders: int) -> dict:
+    """Compare rendering with a fresh DocxTemplate against the template cache."""
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "Umowa_template.docx")
+        build_sample_template(template_path)
+        context = sample_template_data(1)
+
+        cold = []
+        for _ in range(renders):
+            start = time.perf_counter()
+            DocxTemplate(template_path).render(context)
+            cold.append(time.perf_counter() - start)
+
+        cache = TemplateCache()
+        cache.render(template_path, context)
+        warm = []
+        for _ in range(renders):
+            start = time.perf_counter()
+            cache.render(template_path, context)
+            warm.append(time.perf_counter() - start)
+
+    print(f"bez pamięci podręcznej: {mean(cold) * 1000:.2f} ms")
+    print(f"z pamięcią podręczną:   {mean(warm) * 1000:.2f} ms")
+    return {"cold_ms": mean(cold) * 1000, "warm_ms": mean(warm) * 1000}
+
+
+def bench_batch(contracts: int, workers_options) -> dict:
+    """Measure batch throughput for different numbers of rendering processes."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "Umowa_template.docx")
+        build_sample_template(template_path)
+        records = [sample_template_data(number) for number in range(1, contracts + 1)]
+
+        print(f"{'procesy':>8} {'czas [s]':>10} {'umowy/s':>10}")
+        for workers in workers_options:
+            output_dir = os.path.join(tmp, f"umowy_{workers}")
+            os.makedirs(output_dir)
+            start = time.perf_counter()
+            generate_batch(ContractBatch.from_records(records), template_path, output_dir,
+                           os.path.join(output_dir, "spis.xlsx"), "2024", workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>8} {elapsed:>10.2f} {contracts / elapsed:>10.1f}")
+            results.append({"workers": workers, "seconds": elapsed, "contracts_per_s": contracts / elapsed})
+    return {"contracts": contracts, "runs": results}
+
+
+def bench_bulk(rows: int) -> dict:
+    """Compare memory and time of a list of ContractData against a ContractBatch for a bulk import."""
+    def records():
+        for number in range(1, rows + 1):
+            values = sample_template_data(number, gmina=("GO", "S")[number % 2])
+            values["nazwa"] = f"Klient {number}"
+            yield {key: value for key, value in values.items() if key not in ("nr", "rok")}
+
+    def per_record():
+        contracts = [ContractData.from_dict(values) for values in records()]
+        ContractValidator.validate_table({key: [values[key] for values in map(ContractData.to_values, contracts)]
+                                          for key in ("data", "gmina", "nazwa", "kod_pocztowy", "numer_domu")})
+        # Template data of every job, then registry rows built from it as in save_all_to_excel
+        data = [contract.to_dict(number, "2024") for number, contract in enumerate(contracts, start=1)]
+        return contracts, data, [registry_row(values) for values in data]
+
+    def columnar():
+        contracts = ContractBatch.from_records(records())
+        contracts.validate()
+        contracts.numbers = array('L', range(1, rows + 1))
+        contracts.year = "2024"
+        # Template data is built per rendered job and registry rows are streamed to the journal
+        return contracts, sum(1 for _ in contracts.registry_rows())
+
+    results = {}
+    print(f"{'wariant':>12} {'czas [s]':>10} {'pamięć [MB]':>12}")
+    for name, build in (("ContractData", per_record), ("ContractBatch", columnar)):
+        start = time.perf_counter()
+        build()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        kept = build()
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+        del kept
+        print(f"{name:>12} {elapsed:>10.2f} {peak:>12.1f}")
+        results[name] = {"seconds": elapsed, "peak_mb": peak}
+    return {"rows": rows, "variants": results}
+
+
+def bench_single(contracts: int) -> dict:
+    """Measure per-stage latency of single contracts written like in the GUI."""
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "Umowa_template.docx")
+        build_sample_template(template_path)
+        paths = {"template": template_path, "contracts": tmp, "excel": tmp,
+                 "excel_file": os.path.join(tmp, "spis_umow_automat.xlsx")}
+        metrics = PipelineMetrics()
+        writer = ContractWriter(metrics=metrics, pdf_enabled=False)
+        for number in range(1, contracts + 1):
+            writer.write(ContractData.from_dict(sample_template_data(number)), paths, "2024")
+        # Merge before the folder is removed under the background flusher
+        ContractManager.flush_registry(paths["excel_file"])
+
+    print(metrics.format_summary())
+    return {
+        "contracts": contracts,
+        "stages": {stage: {"count": count, "p50_ms": p50 * 1000, "p95_ms": p95 * 1000}
+                   for stage, (count, p50, p95) in metrics.summary().items()},
+    }
+
+
+def bench_service(clients: int, contracts: int) -> dict:
+    """Send concurrent generation requests to a local service and check the numbering."""
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "Umowa_template.docx")
+        build_sample_template(template_path)
+        paths = {"template": template_path, "contracts": tmp, "excel": tmp,
+                 "excel_file": os.path.join(tmp, "spis_umow_automat.xlsx")}
+        service = ContractService(paths, "127.0.0.1", 0).start()
+        service.warm_up()
+        client = ServiceClient(service.url)
+
+        def send(number: int) -> float:
+            start = time.perf_counter()
+            client.generate(ContractData.from_dict(sample_template_data(number)), force=True)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            timings = sorted(executor.map(send, range(1, clients * contracts + 1)))
+        elapsed = time.perf_counter() - start
+        service.shutdown()
+
+        numbers = sorted(int(match.group(1)) for file in os.listdir(tmp)
+                         if (match := CONTRACT_FILE_PATTERN.match(file)))
+
+    ok = numbers == list(range(1, clients * contracts + 1))
+    p50, p95 = timings[len(timings) // 2], timings[int(0.95 * (len(timings) - 1))]
+    print(f"klienci: {clients}, umowy: {len(timings)}, czas: {elapsed:.2f} s, "
+          f"p50: {p50 * 1000:.1f} ms, p95: {p95 * 1000:.1f} ms")
+    print(f"numeracja: {'OK' if ok else 'BŁĄD'}")
+    return {"clients": clients, "contracts": len(timings), "seconds": elapsed,
+            "p50_ms": p50 * 1000, "p95_ms": p95 * 1000, "ok": ok}
+
+
+def seed_contracts_folder(folder: str, files: int):
+    """Create empty contract files spread over two years and four gminas."""
+    gminas = ("GO", "R", "S", "PR")
+    for index in range(files):
+        year = "2023" if index % 2 else "2024"
+        gmina = gminas[index % len(gminas)]
+        number = index // (2 * len(gminas)) + 1
+        open(os.path.join(folder, f"Umowa_{number}_{year}_{gmina}_Klient {index}.docx"), 'wb').close()
+
+
+def bench_numbering(sizes, lookups: int) -> dict:
+    """Measure get_next_contract_number on folders of growing size, with and without the index."""
+    results = []
+    print(f"{'pliki':>10} {'bez indeksu [ms]':>18} {'z indeksem [ms]':>16}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            seed_contracts_folder(tmp, size)
+
+            start = time.perf_counter()
+            ContractManager.get_next_contract_number(tmp, "GO", "2024")
+            cold = time.perf_counter() - start
+
+            warm = []
+            for _ in range(lookups):
+                start = time.perf_counter()
+                ContractManager.get_next_contract_number(tmp, "GO", "2024")
+                warm.append(time.perf_counter() - start)
+
+        print(f"{size:>10} {cold * 1000:>18.2f} {mean(warm) * 1000:>16.3f}")
+        results.append({"files": size, "rebuild_ms": cold * 1000, "lookup_ms": mean(warm) * 1000})
+    return {"numbering": results}
+
+
+def bench_pdf(converter_name: str, files: int, batch_size: int) -> dict:
+    """Measure PDF conversion throughput of a warm converter."""
+    with tempfile.TemporaryDirectory() as tmp:
+        template_path = os.path.join(tmp, "Umowa_template.docx")
+        build_sample_template(template_path)
+        cache = TemplateCache()
+        paths = []
+        for number in range(1, files + 1):
+            path = os.path.join(tmp, f"Umowa_{number}_2024_GO_Klient {number}.docx")
+            cache.render(template_path, sample_template_data(number)).save(path)
+            paths.append(path)
+
+        with get_converter(converter_name) as converter:
+            start = time.perf_counter()
+            convert_all(converter, paths[:1], batch_size)
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            convert_all(converter, paths[1:], batch_size)
+            rest = time.perf_counter() - start
+
+    print(f"konwerter: {converter_name}, pierwszy plik: {first:.2f} s")
+    if files > 1:
+        print(f"kolejne pliki: {rest / (files - 1) * 1000:.1f} ms/plik, {(files - 1) / rest:.1f} plików/s")
+    return {"converter": converter_name, "first_s": first,
+            "per_file_ms": rest / (files - 1) * 1000 if files > 1 else None}
+
+
+def bench_validate(rows: int, max_ms: float) -> dict:
+    """Measure table validation of synthetic rows with a share of invalid cells."""
+    records = [sample_template_data(number) for number in range(1, rows + 1)]
+    for number, record in enumerate(records):
+        if number % 50 == 0:
+            record['kod_pocztowy'] = "00-000"
+        if number % 70 == 0:
+            record['nip'] = "1234567890"
+        if number % 90 == 0:
+            record['miejscowosc'] = "Nieznana"
+    columns = {key: [record[key] for record in records] for key in records[0]}
+
+    start = time.perf_counter()
+    report = ContractValidator.validate_table(columns)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"wiersze: {rows}, błędy: {len(report.issues)}, "
+          f"błędne wiersze: {len(report.invalid_rows)}, czas: {elapsed:.1f} ms (limit {max_ms:.0f} ms)")
+    return {"rows": rows, "issues": len(report.issues), "ms": elapsed, "ok": elapsed <= max_ms}
+
+
+# Libraries that must not be imported before the main window is shown
+LAZY_MODULES = ("docxtpl", "openpyxl")
+
+
+def bench_imports(module: str, max_ms: float, top: int) -> bool:
+    """Report `python -X importtime` for a module and check that heavy libraries stay lazy."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        print(result.stderr)
+        return False
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            timings[name.strip()] = int(cumulative) / 1000
+
+    total = timings.get(module, 0.0)
+    for name, elapsed in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{elapsed:>10.1f} ms  {name}")
+
+    eager = [name for name in LAZY_MODULES if name in timings]
+    print(f"import {module}: {total:.1f} ms (limit {max_ms:.0f} ms)")
+    if eager:
+        print(f"importowane przy starcie: {', '.join(eager)}")
+    return total <= max_ms and not eager
+
+
+def _stress_worker(contracts_dir: str, excel_path: str, contracts: int):
+    """Allocate numbers and append registry rows like a single workstation."""
+    for _ in range(contracts):
+        number = ContractManager.reserve_contract_number(contracts_dir, "GO", "2024")
+        filename = f"Umowa_{number}_2024_GO_Klient {number}.docx"
+        with open(os.path.join(contracts_dir, filename), 'wb') as document:
+            document.write(os.urandom(4096))
+        ContractManager.save_to_excel(sample_template_data(number), excel_path)
+    # Processes started by multiprocessing skip atexit, so wait for the flusher like a closing app
+    stop_background_flushers()
+
+
+def stress_shared_folder(processes: int, contracts: int) -> bool:
+    """Run concurrent writers against one folder and verify numbering and registry."""
+    with tempfile.TemporaryDirectory() as tmp:
+        excel_path = os.path.join(tmp, "spis_umow_automat.xlsx")
+        workers = [
+            multiprocessing.Process(target=_stress_worker, args=(tmp, excel_path, contracts))
+            for _ in range(processes)
+        ]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        ContractManager.flush_registry(excel_path)
+        elapsed = time.perf_counter() - start
+
+        expected = list(range(1, processes * contracts + 1))
+        numbers = sorted(
+            int(match.group(1)) for file in os.listdir(tmp)
+            if (match := CONTRACT_FILE_PATTERN.match(file))
+        )
+        registry_numbers = sorted(
+            int(str(value).split('/')[0])
+            for (value,) in load_workbook(excel_path, read_only=True).active.iter_rows(
+                min_row=2, min_col=2, max_col=2, values_only=True)
+        )
+
+    ok = numbers == expected and registry_numbers == expected
+    print(f"procesy: {processes}, umowy: {processes * contracts}, czas: {elapsed:.2f} s")
+    print(f"numeracja: {'OK' if numbers == expected else 'BŁĄD'}, "
+          f"rejestr: {'OK' if registry_numbers == expected else 'BŁĄD'}")
+    return ok
+
+
+def run_suite(quick: bool) -> dict:
+    """Run the pipeline benchmarks with fixed sizes, smaller ones when quick."""
+    if quick:
+        return {
+            "single": bench_single(10),
+            "batch": bench_batch(20, [1]),
+            "numbering": bench_numbering([1_000, 10_000], 20),
+            "registry": bench_registry([1_000, 10_000], 10),
+            "template": bench_template(10),
+            "validate": bench_validate(10_000, 500.0),
+        }
+    return {
+        "single": bench_single(50),
+        "batch": bench_batch(200, [1, 2, 4]),
+        "numbering": bench_numbering([1_000, 10_000, 100_000], 100),
+        "registry": bench_registry([10_000, 50_000, 100_000], 20),
+        "template": bench_template(50),
+        "validate": bench_validate(100_000, 500.0),
+    }
+
+
+def write_results(path: str, benchmark: str, results: dict):
+    """Save results with the environment they were measured in as JSON."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    document = {
+        "benchmark": benchmark,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    with open(path, 'w', encoding='utf-8') as results_file:
+        json.dump(document, results_file, ensure_ascii=False, indent=2)
+
+
+def main():
+    """Run the selected benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", metavar="PLIK", help="zapisz wyniki w formacie JSON")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    suite_parser = subparsers.add_parser("suite", help="wszystkie testy wydajności potoku")
+    suite_parser.add_argument("--quick", action="store_true", help="mniejsze rozmiary danych")
+
+    single_parser = subparsers.add_parser("single", help="czas generowania pojedynczej umowy")
+    single_parser.add_argument("--contracts", type=int, default=50)
+
+    numbering_parser = subparsers.add_parser("numbering", help="wyznaczanie kolejnego numeru umowy")
+    numbering_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    numbering_parser.add_argument("--lookups", type=int, default=100)
+
+    service_parser = subparsers.add_parser("service", help="lokalna usługa HTTP z wieloma klientami")
+    service_parser.add_argument("--clients", type=int, default=4)
+    service_parser.add_argument("--contracts", type=int, default=10)
+
+    registry_parser = subparsers.add_parser("registry", help="zapis do rejestru Excel")
+    registry_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    registry_parser.add_argument("--contracts", type=int, default=20)
+
+    bulk_parser = subparsers.add_parser("bulk", help="pamięć partii umów przy imporcie masowym")
+    bulk_parser.add_argument("--rows", type=int, default=100_000)
+
+    query_parser = subparsers.add_parser("query", help="filtrowany eksport rejestru")
+    query_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+
+    template_parser = subparsers.add_parser("template", help="renderowanie szablonu")
+    template_parser.add_argument("--renders", type=int, default=50)
+
+    batch_parser = subparsers.add_parser("batch", help="przepustowość trybu wsadowego")
+    batch_parser.add_argument("--contracts", type=int, default=200)
+    batch_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+
+    imports_parser = subparsers.add_parser("imports", help="czas importu przy starcie aplikacji")
+    imports_parser.add_argument("--module", default="main")
+    imports_parser.add_argument("--max-ms", type=float, default=250.0)
+    imports_parser.add_argument("--top", type=int, default=10)
+
+    pdf_parser = subparsers.add_parser("pdf", help="konwersja umów do PDF")
+    pdf_parser.add_argument("--converter", choices=sorted(PDF_CONVERTERS), default="stub")
+    pdf_parser.add_argument("--files", type=int, default=20)
+    pdf_parser.add_argument("--batch-size", type=int, default=None)
+
+    validate_parser = subparsers.add_parser("validate", help="walidacja całej tabeli klientów")
+    validate_parser.add_argument("--rows", type=int, default=100_000)
+    validate_parser.add_argument("--max-ms", type=float, default=500.0)
+
+    stress_parser = subparsers.add_parser("stress", help="współbieżne stanowiska na jednym folderze")
+    stress_parser.add_argument("--processes", type=int, default=8)
+    stress_parser.add_argument("--contracts", type=int, default=25)
+
+    args = parser.parse_args()
+    if args.benchmark == "suite":
+        results = run_suite(args.quick)
+    elif args.benchmark == "single":
+        results = bench_single(args.contracts)
+    elif args.benchmark == "numbering":
+        results = bench_numbering(args.sizes, args.lookups)
+    elif args.benchmark == "service":
+        results = bench_service(args.clients, args.contracts)
+    elif args.benchmark == "registry":
+        results = bench_registry(args.sizes, args.contracts)
+    elif args.benchmark == "bulk":
+        results = bench_bulk(args.rows)
+    elif args.benchmark == "query":
+        results = bench_query(args.sizes)
+    elif args.benchmark == "template":
+        results = bench_template(args.renders)
+    elif args.benchmark == "batch":
+        results = bench_batch(args.contracts, args.workers)
+    elif args.benchmark == "imports":
+        results = {"ok": bench_imports(args.module, args.max_ms, args.top)}
+    elif args.benchmark == "pdf":
+        results = bench_pdf(args.converter, args.files, args.batch_size)
+    elif args.benchmark == "validate":
+        results = bench_validate(args.rows, args.max_ms)
+    else:
+        results = {"ok": stress_shared_folder(args.processes, args.contracts)}
+
+    if args.json:
+        write_results(args.json, args.benchmark, results)
+    if not results.get("ok", True):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
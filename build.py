@@ -12,6 +12,7 @@ def build_exe():
         '--onefile',
         '--windowed',
         '--add-data=Umowa_template.docx;.',
+        '--add-data=reference_data.json;.',
         '--icon=contract.ico',  # Add icon
         '--clean',
         '--path=.',
@@ -0,0 +1,229 @@
+# cli.py
+"""Command line entry point for headless Contract Generator tasks."""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+from datetime import datetime
+
+from config import (DEFAULT_PATHS, GMINA_POSTAL_CODES, INSTRUMENTATION_SETTINGS, PDF_SETTINGS, REGISTRY_SETTINGS,
+                    SERVICE_SETTINGS)
+from batch import generate_batch, iter_customers, load_contracts, rerender_contracts
+from contract_data import ContractManager
+from registry_query import RegistryQuery, contract_date
+from instrumentation import PipelineMetrics
+from layout import migrate_to_shards
+from pdf import PDF_CONVERTERS, convert_all, get_converter
+from service import ContractService
+from validators import ContractValidator
+
+
+def run_batch(args) -> int:
+    """Generate contracts for every customer in the input file."""
+    ContractValidator.validate_paths(args.template, [args.contracts, args.excel])
+
+    contracts, errors = load_contracts(iter_customers(args.input), args.date)
+    if errors:
+        for row_number, message in errors:
+            print(f"Wiersz {row_number}: {message}", file=sys.stderr)
+        invalid_rows = len({row_number for row_number, _ in errors})
+        print(f"Błędne wiersze: {invalid_rows} z {len(contracts) + invalid_rows}. Nie wygenerowano żadnej umowy.",
+              file=sys.stderr)
+        return 1
+
+    year = datetime.now().strftime("%Y")
+    excel_path = os.path.join(args.excel, DEFAULT_PATHS["excel_filename"])
+    metrics = PipelineMetrics(log_file=INSTRUMENTATION_SETTINGS["log_file"] or None)
+    with metrics.trace(os.path.basename(args.input), profile=args.profile) as trace:
+        output_paths = generate_batch(contracts, args.template, args.contracts, excel_path, year, args.workers)
+        print(f"Wygenerowano umów: {len(output_paths)}")
+
+        if args.pdf:
+            with trace.stage("pdf"), get_converter(args.converter) as converter:
+                pdf_files = convert_all(converter, output_paths)
+            print(f"Utworzono plików PDF: {len(pdf_files)}")
+
+    if args.timings:
+        print(metrics.format_summary())
+    return 0
+
+
+def run_rerender(args) -> int:
+    """Render the registered contracts of a year again with the current template."""
+    ContractValidator.validate_paths(args.template, [args.contracts, args.excel])
+    excel_path = os.path.join(args.excel, DEFAULT_PATHS["excel_filename"])
+    metrics = PipelineMetrics(log_file=INSTRUMENTATION_SETTINGS["log_file"] or None)
+    with metrics.trace(f"ponownie {args.year}", profile=args.profile):
+        rendered, unchanged = rerender_contracts(args.template, args.contracts, excel_path, args.year,
+                                                 args.gmina, args.workers)
+    print(f"Wygenerowano ponownie umów: {rendered}, bez zmian: {unchanged}")
+    if args.timings:
+        print(metrics.format_summary())
+    return 0
+
+
+def run_import_registry(args) -> int:
+    """Load the existing Excel registry into the SQLite registry."""
+    excel_path = os.path.join(args.excel, DEFAULT_PATHS["excel_filename"])
+    db_path = os.path.join(args.excel, REGISTRY_SETTINGS["sqlite_filename"])
+    imported = ContractManager.import_registry(excel_path, db_path)
+    print(f"Zaimportowano wierszy: {imported}")
+    return 0
+
+
+def run_export_registry(args) -> int:
+    """Regenerate the Excel registry from the SQLite registry."""
+    excel_path = os.path.join(args.excel, DEFAULT_PATHS["excel_filename"])
+    db_path = os.path.join(args.excel, REGISTRY_SETTINGS["sqlite_filename"])
+    exported = ContractManager.export_registry(db_path, excel_path)
+    print(f"Wyeksportowano wierszy: {exported}")
+    return 0
+
+
+def run_query_registry(args) -> int:
+    """Export registry rows matching the filters to a CSV or Excel file."""
+    excel_path = os.path.join(args.excel, DEFAULT_PATHS["excel_filename"])
+    dates = []
+    for value in (args.date_from, args.date_to):
+        parsed = contract_date(value) if value else None
+        if value and parsed is None:
+            raise ValueError(f"Nieprawidłowa data: {value} (oczekiwano DD.MM.RRRR)")
+        dates.append(parsed)
+    query = RegistryQuery(year=args.year, gmina=args.gmina, is_eco=args.eco,
+                          date_from=dates[0], date_to=dates[1])
+    exported = ContractManager.export_filtered(excel_path, args.output, query)
+    print(f"Wyeksportowano wierszy: {exported}")
+    return 0
+
+
+def run_rollover_registry(args) -> int:
+    """Move rows of past years from the Excel registry into yearly archives."""
+    excel_path = os.path.join(args.excel, DEFAULT_PATHS["excel_filename"])
+    archived = ContractManager.rollover_registry(excel_path, args.year)
+    for year, rows in archived.items():
+        print(f"Zarchiwizowano wierszy z roku {year}: {rows}")
+    if not archived:
+        print("Brak wierszy do zarchiwizowania")
+    return 0
+
+
+def run_serve(args) -> int:
+    """Run the local generation service until interrupted."""
+    ContractValidator.validate_paths(args.template, [args.contracts, args.excel])
+    paths = {
+        "template": args.template,
+        "contracts": args.contracts,
+        "excel": args.excel,
+        "excel_file": os.path.join(args.excel, DEFAULT_PATHS["excel_filename"]),
+    }
+    service = ContractService(paths, args.host, args.port)
+    service.warm_up()
+    # Stop cleanly when terminated by a service manager, not only on Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Usługa generowania umów: {service.url}", flush=True)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+def run_migrate_layout(args) -> int:
+    """Move contracts from the flat folder into <rok>/<gmina> folders."""
+    if not os.path.isdir(args.contracts):
+        raise ValueError(f"Nie znaleziono folderu {args.contracts}")
+    moved = migrate_to_shards(args.contracts)
+    print(f"Przeniesiono plików: {moved}")
+    return 0
+
+
+def main():
+    """Parse arguments and run the selected command."""
+    multiprocessing.freeze_support()
+    parser = argparse.ArgumentParser(description="Generator Umów - tryb wsadowy")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="generowanie umów z pliku CSV/XLSX")
+    batch_parser.add_argument("input", help="plik CSV lub XLSX z danymi klientów")
+    batch_parser.add_argument("--template", default=DEFAULT_PATHS["template"])
+    batch_parser.add_argument("--contracts", default=DEFAULT_PATHS["contracts"])
+    batch_parser.add_argument("--excel", default=DEFAULT_PATHS["excel"])
+    batch_parser.add_argument("--date", default=datetime.now().strftime("%d.%m.%Y"),
+                              help="data umowy dla wierszy bez daty")
+    batch_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                              help="liczba procesów renderujących dokumenty")
+    batch_parser.add_argument("--pdf", action="store_true", default=PDF_SETTINGS["enabled"],
+                              help="zapisz również kopie umów w PDF")
+    batch_parser.add_argument("--converter", choices=sorted(PDF_CONVERTERS), default=PDF_SETTINGS["converter"],
+                              help="konwerter PDF")
+    batch_parser.add_argument("--timings", action="store_true", help="wypisz czasy poszczególnych etapów")
+    batch_parser.add_argument("--profile", action="store_true", default=INSTRUMENTATION_SETTINGS["profile"],
+                              help="zapisz profil cProfile")
+    batch_parser.set_defaults(handler=run_batch)
+
+    rerender_parser = subparsers.add_parser("rerender",
+                                            help="ponowne wygenerowanie umów z rejestru po zmianie szablonu")
+    rerender_parser.add_argument("--year", default=datetime.now().strftime("%Y"), help="rok z numeru umowy")
+    rerender_parser.add_argument("--gmina", choices=sorted(GMINA_POSTAL_CODES))
+    rerender_parser.add_argument("--template", default=DEFAULT_PATHS["template"])
+    rerender_parser.add_argument("--contracts", default=DEFAULT_PATHS["contracts"])
+    rerender_parser.add_argument("--excel", default=DEFAULT_PATHS["excel"])
+    rerender_parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                                 help="liczba procesów renderujących dokumenty")
+    rerender_parser.add_argument("--timings", action="store_true", help="wypisz czasy poszczególnych etapów")
+    rerender_parser.add_argument("--profile", action="store_true", default=INSTRUMENTATION_SETTINGS["profile"],
+                                 help="zapisz profil cProfile")
+    rerender_parser.set_defaults(handler=run_rerender)
+
+    import_parser = subparsers.add_parser("import-registry", help="import pliku Excel do rejestru SQLite")
+    import_parser.add_argument("--excel", default=DEFAULT_PATHS["excel"])
+    import_parser.set_defaults(handler=run_import_registry)
+
+    export_parser = subparsers.add_parser("export-registry", help="odtworzenie pliku Excel z rejestru SQLite")
+    export_parser.add_argument("--excel", default=DEFAULT_PATHS["excel"])
+    export_parser.set_defaults(handler=run_export_registry)
+
+    query_parser = subparsers.add_parser("query-registry", help="eksport wybranych umów z rejestru")
+    query_parser.add_argument("output", help="plik wynikowy .csv lub .xlsx")
+    query_parser.add_argument("--excel", default=DEFAULT_PATHS["excel"])
+    query_parser.add_argument("--year", help="rok z numeru umowy")
+    query_parser.add_argument("--gmina", choices=sorted(GMINA_POSTAL_CODES))
+    query_parser.add_argument("--eco", choices=["tak", "nie"])
+    query_parser.add_argument("--from", dest="date_from", help="data umowy od (DD.MM.RRRR)")
+    query_parser.add_argument("--to", dest="date_to", help="data umowy do (DD.MM.RRRR)")
+    query_parser.set_defaults(handler=run_query_registry)
+
+    rollover_parser = subparsers.add_parser("rollover-registry",
+                                            help="przeniesienie umów z poprzednich lat do archiwum")
+    rollover_parser.add_argument("--excel", default=DEFAULT_PATHS["excel"])
+    rollover_parser.add_argument("--year", default=datetime.now().strftime("%Y"),
+                                 help="pierwszy rok pozostający w bieżącym pliku Excel")
+    rollover_parser.set_defaults(handler=run_rollover_registry)
+
+    migrate_parser = subparsers.add_parser("migrate-layout",
+                                           help="podział folderu umów na podfoldery <rok>/<gmina>")
+    migrate_parser.add_argument("--contracts", default=DEFAULT_PATHS["contracts"])
+    migrate_parser.set_defaults(handler=run_migrate_layout)
+
+    serve_parser = subparsers.add_parser("serve", help="lokalna usługa HTTP generowania umów")
+    serve_parser.add_argument("--template", default=DEFAULT_PATHS["template"])
+    serve_parser.add_argument("--contracts", default=DEFAULT_PATHS["contracts"])
+    serve_parser.add_argument("--excel", default=DEFAULT_PATHS["excel"])
+    serve_parser.add_argument("--host", default=SERVICE_SETTINGS["host"])
+    serve_parser.add_argument("--port", type=int, default=SERVICE_SETTINGS["port"])
+    serve_parser.set_defaults(handler=run_serve)
+
+    args = parser.parse_args()
+    try:
+        sys.exit(args.handler(args))
+    except (ValueError, OSError) as e:
+        print(f"Błąd: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
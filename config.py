@@ -1,96 +1,98 @@
 # config.py
 """Configuration settings and constants for the Contract Generator application."""
 
-POSTAL_CODES = {
-    "63-400": "Ostrów Wielkopolski",
-    "63-405": "Sieroszewice",
-    "63-410": "Ostrów Wielkopolski",
-    "63-421": "Przygodzice",
-    "63-430": "Odolanów",
-    "63-440": "Raszków",
-    "63-450": "Sobótka",
+from reference_data import load_reference_data
+
+DEFAULT_PATHS = {
+    "template": "Umowa_template.docx",
+    "contracts": "wystawione_umowy",
+    "excel": "wystawione_umowy",
+    "excel_filename": "spis_umow_automat.xlsx",
+    "reference_data": "reference_data.json"
 }
 
-VALID_GMINAS = {
-    "GO": "Gmina Ostrów",
-    "MO": "Miasto Ostrów",
-    "O": "Odolanów",
-    "R": "Raszków",
-    "S": "Sieroszewice",
-    "P": "Przygodzice",
+# Gminas, postal codes and localities come from an external file so that new
+# municipalities can be added without rebuilding the application
+REFERENCE_DATA = load_reference_data(DEFAULT_PATHS["reference_data"])
+
+POSTAL_CODES = REFERENCE_DATA.postal_codes
+VALID_GMINAS = REFERENCE_DATA.valid_gminas
+GMINA_POSTAL_CODES = REFERENCE_DATA.gmina_postal_codes
+GMINA_LOCATIONS = REFERENCE_DATA.gmina_locations
+MAIN_LOCATIONS = REFERENCE_DATA.main_locations
+
+REGISTRY_SETTINGS = {
+    # Library writing the Excel file
+    "backend": "openpyxl",
+    # "journal" merges a CSV journal into the Excel file; "sqlite" keeps the registry in
+    # sqlite_filename and exports the Excel file from it
+    "storage": "journal",
+    "journal_suffix": ".journal.csv",
+    "flush_every": 25,
+    "flush_stale_after": 600,
+    # Merge the journal on a background thread so saving a contract never waits for the Excel rewrite
+    "background_flush": True,
+    "flush_retry_interval": 30,
+    # Read-only yearly segments written by cli.py rollover-registry, e.g. spis_umow_automat.2023.csv.gz
+    "archive_suffix": ".{year}.csv.gz",
+    "sqlite_filename": "spis_umow.sqlite3",
+    # WAL does not work on network shares; use "delete" there
+    "sqlite_journal_mode": "wal",
+    "sqlite_timeout": 30
 }
 
-GMINA_POSTAL_CODES = {
-    "MO": ["63-400"],
-    "GO": ["63-410", "63-450", "63-400"],
-    "R": ["63-440"],
-    "O": ["63-430"],
-    "S": ["63-405"],
-    "P": ["63-421"],
+NUMBERING_SETTINGS = {
+    "index_filename": ".numeracja.json"
 }
 
-GMINA_LOCATIONS = {
-    "MO": [],
-    "GO": [
-        "Baby", "Bagatela", "Będzieszyn", "Biłgoraje", "Biniew", "Borowiec",
-        "Borowina", "Cegły", "Chruszczyny", "Czekanów", "Daniszyn", "Fabryka",
-        "Franklinów", "Gorzyce Wielkie", "Górzenko", "Górzno", "Gręblów",
-        "Gutów", "Jamy", "Kamionka", "Karski", "Kawetczyzna", "Kąkolewo",
-        "Kołątajew", "Kwiatków", "Lamki", "Lewkowiec", "Lewków", "Łąkociny",
-        "Mazury", "Michałków", "Młynów", "Nowe Kamienice", "Onęber", "Palczew",
-        "Radziwiłłów", "Rejtanów", "Sadowie", "Słaborowice",
-        "Smardowskie Olendry", "Sobczyna", "Sobótka", "Stary Staw", "Szczury",
-        "Świeligów", "Topola Mała", "Trąba", "Warszty", "Wtórek",
-        "Wysocko Wielkie", "Zacharzew", "Zalesie"
-    ],
-    "O": [
-        "Baby", "Bałamącek", "Biadaszki", "Boników", "Chałupki", "Garki",
-        "Gliśnica", "Gorzyce Małe", "Gorzyczki", "Grochowiska", "Harych",
-        "Huta", "Kaczory", "Karłowice", "Kuroch", "Lipiny", "Mogiłka",
-        "Mościska", "Nabyszyce", "Nadstawki", "Papiernia", "Raczyce",
-        "Szmata", "Ściegna", "Świeca", "Tarchały Małe", "Tarchały Wielkie",
-        "Trzcieliny", "Uciechów", "Wierzbno", "Wisławka", "Zawidza",
-        "Żuraw", "Odolanów"
-    ],
-    "R": [
-        "Bieganin", "Bieganinek", "Bugaj", "Drogosław", "Florek", "Głogowa",
-        "Grudzielec", "Grudzielec Nowy", "Janków Zaleśny", "Jaskółki",
-        "Jelitów", "Józefów", "Koryta", "Korytnica", "Ligota", "Majchry",
-        "Moszczanka", "Niemojewiec", "Nychy", "Pogrzybów", "Przybysławice",
-        "Radłów", "Raszkówek", "Rąbczyn", "Skrzebowa", "Sulisław",
-        "Szczurawice", "Walentynów", "Raszków"
-    ],
-    "P": [
-        "Antonin", "Bażantarnia", "Bogufałów", "Chynowa", "Czarnylas",
-        "Dębnica", "Hetmanów", "Janków Przygodzki", "Jezioro", "Katarzynów",
-        "Klady", "Kocięba", "Krzyżaki", "Laski", "Ludwików", "Pardalin",
-        "Popłomyk", "Przygodziczki", "Smardów", "Strugi", "Tarchalskie",
-        "Topola Wielka", "Topola-Osiedle", "Trzcieliny", "Wysocko Małe",
-        "Zawidzyn", "Przygodzice"
-    ],
-    "S": [
-        "Bibianki", "Biernacice", "Bilczew", "Biskupice", "Fidela",
-        "Górski Młyn", "Ilski Młyn", "Kaliszkowice", "Kania", "Kęszyce",
-        "Kowalew", "Latowice", "Małolepsza", "Masanów", "Miłaszka", "Młynik",
-        "Namysłaki", "Ołobok", "Parczew", "Piaski", "Psary", "Rachuta",
-        "Raduchów", "Rososzyca", "Sieroszewice", "Sławin", "Spalony",
-        "Stara Wieś", "Strzyżew", "Strzyżewek", "Urban", "Westrza",
-        "Wielowieś", "Wielowieś", "Wydarta", "Wygoda", "Zamość", "Zawicki",
-        "Zmyślona", "Sieroszewice"
-    ]
+# Generated documents
+OUTPUT_SETTINGS = {
+    "manifest_filename": ".umowy_sha256.jsonl",  # content hash per contract file
+    # "flat" or "year_gmina" (<contracts>/<rok>/<gmina>/). Switch existing folders with
+    # 'contract-cli migrate-layout'; the marker it writes takes precedence over this value
+    "layout": "flat",
+    "layout_marker": ".uklad.json"
 }
 
-MAIN_LOCATIONS = {
-    "MO": "Ostrów Wielkopolski",
-    "O": "Odolanów",
-    "R": "Raszków",
-    "P": "Przygodzice",
-    "S": "Sieroszewice"
+# Bulk generation
+BATCH_SETTINGS = {
+    # Template data is built only for jobs queued in the process pool
+    "jobs_per_worker": 4,
+    # Content hashes are saved after this many documents, so an interrupted run resumes
+    "manifest_every": 50
 }
 
-DEFAULT_PATHS = {
-    "template": "Umowa_template.docx",
-    "contracts": "wystawione_umowy",
-    "excel": "wystawione_umowy",
-    "excel_filename": "spis_umow_automat.xlsx"
-}
\ No newline at end of file
+LOCK_SETTINGS = {
+    "timeout": 30,
+    "stale_after": 60,
+    "poll_interval": 0.05
+}
+
+# Optional PDF copies of generated contracts
+PDF_SETTINGS = {
+    "enabled": False,
+    "converter": "unoserver",  # "unoserver" (warm pool), "soffice" (one run per batch) or "stub"
+    "unoserver_path": "unoserver",
+    "soffice_path": "soffice",
+    "pool_size": 1,
+    "base_port": 2003,
+    "startup_timeout": 30,
+    "convert_timeout": 60,
+    "batch_size": 20
+}
+
+# Per-stage timing of contract generation
+INSTRUMENTATION_SETTINGS = {
+    "log_file": "czasy_generowania.log",  # empty to disable the log
+    "window": 200,  # generations kept for p50/p95
+    "profile": False,  # dump a cProfile file per generation
+    "profile_dir": "profile"
+}
+
+# Local generation service shared by workstations; the GUI becomes a thin client when url is set
+SERVICE_SETTINGS = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "url": "",  # e.g. "http://127.0.0.1:8765"
+    "timeout": 30
+}
@@ -0,0 +1,223 @@
+# contract_batch.py
+"""Column-wise container of many contracts for bulk imports."""
+
+import os
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from contract_data import ContractData, ContractManager
+from registry import cell_text
+from registry_db import split_contract_number
+from validators import ContractValidator, ValidationReport
+
+# Template variable names of the stored columns and defaults of ContractData.from_dict
+FIELDS = ('data', 'gmina', 'nazwa', 'kod_pocztowy', 'miasto', 'miejscowosc', 'ulica',
+          'numer_domu', 'email', 'tel', 'is_eco', 'nip')
+DEFAULTS = {'ulica': "-", 'email': "-", 'tel': "-", 'is_eco': "nie"}
+
+# Field of every REGISTRY_COLUMNS entry; the number and the time added are not contract fields
+REGISTRY_FIELDS = ('data', None, 'gmina', 'nazwa', 'nip', 'kod_pocztowy', 'miasto', 'miejscowosc',
+                   'ulica', 'numer_domu', 'email', 'tel', 'is_eco', None)
+
+# Columns with few distinct values; equal values share one string object
+SHARED_FIELDS = ('data', 'gmina', 'kod_pocztowy', 'miasto', 'miejscowosc', 'ulica', 'is_eco')
+
+
+class ContractBatch:
+    """Contracts stored as one list per field instead of one object per contract.
+
+    Numbers are kept in an array once allocated. Template data and
+    ContractData objects are built per row only when a row is rendered or
+    inspected, so a batch of many thousands of customers costs little more
+    than its strings.
+    """
+
+    __slots__ = ("columns", "numbers", "year")
+
+    def __init__(self, columns: Dict[str, List[str]]):
+        lengths = {len(columns[field]) for field in FIELDS}
+        if len(lengths) > 1:
+            raise ValueError("Kolumny partii umów mają różną liczbę wierszy")
+        self.columns = columns
+        self.numbers: Optional[array] = None
+        self.year: Optional[str] = None
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], default_date: str = "") -> "ContractBatch":
+        """Build a batch from form-like records read one at a time; a missing date becomes default_date."""
+        columns = {field: [] for field in FIELDS}
+        shared = {field: {} for field in SHARED_FIELDS}
+        appenders = [(field, columns[field].append, DEFAULTS.get(field, ""), shared.get(field))
+                     for field in FIELDS]
+        for record in records:
+            for field, append, default, values in appenders:
+                value = record.get(field, default)
+                if value is None:
+                    value = default
+                if field == 'data' and not value:
+                    value = default_date
+                append(value if values is None else values.setdefault(value, value))
+        return cls(columns)
+
+    @classmethod
+    def from_contracts(cls, contracts: Iterable[ContractData]) -> "ContractBatch":
+        """Build a batch from ContractData objects."""
+        return cls.from_records(contract.to_values() for contract in contracts)
+
+    @classmethod
+    def from_registry_rows(cls, rows: Iterable[list], year: str) -> "ContractBatch":
+        """Numbered batch of the registry rows of a year, keeping their contract numbers.
+
+        A number listed more than once keeps its last row; rows with an
+        unreadable number are skipped.
+        """
+        records = {}
+        for row in rows:
+            try:
+                number, row_year, gmina = split_contract_number(row[1])
+            except ValueError:
+                continue
+            if row_year != year:
+                continue
+            record = {field: cell_text(value) for field, value in zip(REGISTRY_FIELDS, row) if field}
+            record['gmina'] = gmina
+            records[(gmina, number)] = record
+
+        batch = cls.from_records(records.values())
+        batch.numbers = array('L', (number for _, number in records))
+        batch.year = year
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.columns['gmina'])
+
+    def validate(self, first_row: int = 2) -> ValidationReport:
+        """Validate every row column by column."""
+        return ContractValidator.validate_table(self.columns, first_row)
+
+    def select(self, indexes: Iterable[int]) -> "ContractBatch":
+        """New batch with the given rows, in the given order."""
+        indexes = list(indexes)
+        selected = ContractBatch({field: [values[i] for i in indexes] for field, values in self.columns.items()})
+        if self.numbers is not None:
+            selected.numbers = array(self.numbers.typecode, (self.numbers[i] for i in indexes))
+            selected.year = self.year
+        return selected
+
+    def contract(self, index: int) -> ContractData:
+        """ContractData of one row."""
+        return ContractData.from_dict({field: values[index] for field, values in self.columns.items()})
+
+    def allocate_numbers(self, contracts_dir: str, year: str, excel_path: str = None):
+        """Reserve one block of numbers per gmina and assign them in row order."""
+        gminas = self.columns['gmina']
+        next_numbers = {
+            gmina: ContractManager.reserve_contract_number(contracts_dir, gmina, year, count, excel_path)
+            for gmina, count in Counter(gminas).items()
+        }
+        numbers = array('L', [0]) * len(gminas)
+        for index, gmina in enumerate(gminas):
+            numbers[index] = next_numbers[gmina]
+            next_numbers[gmina] += 1
+        self.numbers = numbers
+        self.year = year
+
+    def release_numbers(self, contracts_dir: str, written: Sequence, excel_path: str = None):
+        """Give back reserved numbers after the last written contract of each gmina."""
+        last_written = {}
+        for gmina, number, ok in zip(self.columns['gmina'], self.numbers, written):
+            if ok:
+                last_written[gmina] = number
+
+        unused = {}
+        for gmina, number in zip(self.columns['gmina'], self.numbers):
+            if number > last_written.get(gmina, 0):
+                first, count = unused.get(gmina, (number, 0))
+                unused[gmina] = (first, count + 1)
+
+        for gmina, (first, count) in unused.items():
+            ContractManager.release_contract_number(contracts_dir, gmina, self.year, first, count, excel_path)
+
+    def filename(self, index: int) -> str:
+        """Document file name of a numbered row."""
+        return ContractManager.contract_filename(self.numbers[index], self.year,
+                                                 self.columns['gmina'][index], self.columns['nazwa'][index])
+
+    def template_data(self, index: int) -> dict:
+        """Template data of a numbered row, equal to ContractData.to_dict."""
+        columns = self.columns
+        return {
+            'data': columns['data'][index],
+            'gmina': columns['gmina'][index],
+            'nazwa': columns['nazwa'][index],
+            'kod_pocztowy': columns['kod_pocztowy'][index],
+            'miasto': columns['miasto'][index],
+            'miejscowosc': columns['miejscowosc'][index],
+            'ulica': columns['ulica'][index],
+            'numer_domu': columns['numer_domu'][index],
+            'email': columns['email'][index] or "-",
+            'tel': columns['tel'][index] or "-",
+            'nr': str(self.numbers[index]),
+            'rok': self.year,
+            'nip': columns['nip'][index] or "",
+            'is_eco': columns['is_eco'][index],
+        }
+
+    def template_contexts(self) -> "TemplateContexts":
+        """Sequence building the template data of a row when it is accessed."""
+        return TemplateContexts(self)
+
+    def registry_rows(self, indexes: Iterable[int] = None) -> Iterator[list]:
+        """Registry rows of numbered rows, built straight from the columns."""
+        columns = self.columns
+        added = datetime.now().strftime("%d.%m.%Y %H:%M")
+        for index in range(len(self)) if indexes is None else indexes:
+            gmina = columns['gmina'][index]
+            yield [
+                columns['data'][index],
+                f"{self.numbers[index]}/{self.year}/{gmina}",
+                gmina,
+                columns['nazwa'][index],
+                columns['nip'][index] or "",
+                columns['kod_pocztowy'][index],
+                columns['miasto'][index],
+                columns['miejscowosc'][index],
+                columns['ulica'][index],
+                columns['numer_domu'][index],
+                columns['email'][index] or "-",
+                columns['tel'][index] or "-",
+                columns['is_eco'][index],
+                added,
+            ]
+
+    def append_to_registry(self, excel_path: str, indexes: Iterable[int] = None):
+        """Append numbered rows to the registry in one write, streaming them from the columns."""
+        ContractManager.save_rows_to_excel(self.registry_rows(indexes), excel_path)
+
+    def output_paths(self, folders: Dict[str, str]) -> List[str]:
+        """Document paths of numbered rows, given the output folder of each gmina."""
+        return [os.path.join(folders[gmina], self.filename(index))
+                for index, gmina in enumerate(self.columns['gmina'])]
+
+
+class TemplateContexts(Sequence):
+    """Read-only view of a batch yielding template data per row on access."""
+
+    __slots__ = ("batch",)
+
+    def __init__(self, batch: ContractBatch):
+        self.batch = batch
+
+    def __len__(self) -> int:
+        return len(self.batch)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.batch.template_data(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.batch.template_data(index)
@@ -2,10 +2,16 @@
 """Data handling and validation for contract generation."""
 
 import os
-import re
-from datetime import datetime
-import pandas as pd
 from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from config import REGISTRY_SETTINGS
+from locking import LockTimeoutError
+from numbering import ContractNumberIndex
+from registry import RegistryWriter, background_flusher, registry_row, stop_background_flusher
+from registry_archive import archive_years, iter_archives, rollover
+from registry_db import SqliteRegistry
+from registry_query import RegistryQuery, export_rows
 
 
 @dataclass
@@ -24,11 +30,46 @@ class ContractData:
     is_eco: str = "nie"
     nip: str = ""
 
+    @classmethod
+    def from_dict(cls, values: dict) -> "ContractData":
+        """Create contract data from form values keyed like the template variables."""
+        return cls(
+            date=values["data"],
+            gmina=values["gmina"],
+            name=values["nazwa"],
+            postal_code=values["kod_pocztowy"],
+            city=values["miasto"],
+            location=values.get("miejscowosc", ""),
+            street=values.get("ulica", "-"),
+            house_number=values["numer_domu"],
+            email=values.get("email", "-"),
+            phone=values.get("tel", "-"),
+            is_eco=values.get("is_eco", "nie"),
+            nip=values.get("nip", "")
+        )
+
     @property
     def full_address(self) -> str:
         """Combined street and house number."""
         return f"{self.street} {self.house_number}"
 
+    def to_values(self) -> dict:
+        """Convert back to form values accepted by from_dict."""
+        return {
+            'data': self.date,
+            'gmina': self.gmina,
+            'nazwa': self.name,
+            'kod_pocztowy': self.postal_code,
+            'miasto': self.city,
+            'miejscowosc': self.location,
+            'ulica': self.street,
+            'numer_domu': self.house_number,
+            'email': self.email,
+            'tel': self.phone,
+            'nip': self.nip,
+            'is_eco': self.is_eco
+        }
+
     def to_dict(self, contract_number: int, year: str) -> dict:
         """Convert to dictionary format for template rendering."""
         return {
@@ -58,40 +99,184 @@ class ContractManager:
         if not os.path.exists(output_folder):
             return 1
 
-        pattern = rf"Umowa_(\d+)_{year}_{gmina}_"
-        max_nr = max(
-            (int(match.group(1))
-             for file in os.listdir(output_folder)
-             if (match := re.match(pattern, file))),
-            default=0
-        )
-        return max_nr + 1
+        return ContractNumberIndex(output_folder).next_number(gmina, year)
+
+    @staticmethod
+    def registry_db_path(excel_path: str) -> Optional[str]:
+        """SQLite registry next to the Excel file, when the SQLite storage is configured."""
+        if REGISTRY_SETTINGS["storage"] != "sqlite":
+            return None
+        return os.path.join(os.path.dirname(excel_path), REGISTRY_SETTINGS["sqlite_filename"])
+
+    @staticmethod
+    def reserve_contract_number(output_folder: str, gmina: str, year: str, count: int = 1,
+                                excel_path: str = None) -> int:
+        """Allocate contract numbers that no other workstation can take.
+
+        Returns the first of ``count`` consecutive numbers. With the SQLite
+        registry the numbers come from the database next to ``excel_path``.
+        """
+        db_path = ContractManager.registry_db_path(excel_path) if excel_path else None
+        if db_path:
+            with SqliteRegistry(db_path) as registry:
+                return registry.reserve_number(gmina, year, count)
+        return ContractNumberIndex(output_folder).reserve(gmina, year, count)
+
+    @staticmethod
+    def release_contract_number(output_folder: str, gmina: str, year: str, number: int, count: int = 1,
+                                excel_path: str = None):
+        """Give back reserved numbers after a failed generation."""
+        db_path = ContractManager.registry_db_path(excel_path) if excel_path else None
+        if db_path:
+            with SqliteRegistry(db_path) as registry:
+                registry.release_number(gmina, year, number, count)
+            return
+        ContractNumberIndex(output_folder).release(gmina, year, number, count)
+
+    @staticmethod
+    def contract_filename(contract_number: int, year: str, gmina: str, name: str) -> str:
+        """File name of a generated contract document."""
+        return f"Umowa_{contract_number}_{year}_{gmina}_{name}.docx"
 
     @staticmethod
     def save_to_excel(contract_data: dict, excel_path: str):
-        """Save contract data to Excel file."""
+        """Append contract data to the registry."""
+        ContractManager.save_all_to_excel([contract_data], excel_path)
+
+    @staticmethod
+    def save_all_to_excel(contracts_data: List[dict], excel_path: str):
+        """Append many contracts to the registry at once."""
+        ContractManager.save_rows_to_excel([registry_row(data) for data in contracts_data], excel_path)
+
+    @staticmethod
+    def save_rows_to_excel(rows: Iterable[list], excel_path: str):
+        """Append registry rows ordered as REGISTRY_COLUMNS at once."""
         try:
-            df = pd.DataFrame([{
-                'Data umowy': contract_data['data'],
-                'Numer umowy': f"{contract_data['nr']}/{contract_data['rok']}/{contract_data['gmina']}",
-                'Gmina': contract_data['gmina'],
-                'Nazwa/Imię i nazwisko': contract_data['nazwa'],
-                'NIP': contract_data['nip'],
-                'Kod pocztowy': contract_data['kod_pocztowy'],
-                'Miasto': contract_data['miasto'],
-                'Miejscowość': contract_data['miejscowosc'],
-                'Ulica': contract_data['ulica'],
-                'Numer domu': contract_data['numer_domu'],
-                'Email': contract_data['email'],
-                'Telefon': contract_data['tel'],
-                'EKO': contract_data['is_eco'],
-                'Data dodania': datetime.now().strftime("%d.%m.%Y %H:%M")
-            }])
-
-            if os.path.exists(excel_path):
-                existing_df = pd.read_excel(excel_path)
-                df = pd.concat([existing_df, df], ignore_index=True)
-
-            df.to_excel(excel_path, index=False)
+            db_path = ContractManager.registry_db_path(excel_path)
+            if not db_path:
+                RegistryWriter(excel_path).append(rows)
+                return
+
+            with SqliteRegistry(db_path) as registry:
+                registry.add_rows(rows)
+                if registry.pending_export_count() < REGISTRY_SETTINGS["flush_every"]:
+                    return
+                if REGISTRY_SETTINGS["background_flush"]:
+                    background_flusher(os.path.abspath(excel_path),
+                                       lambda: ContractManager._export_pending(db_path, excel_path)).request()
+                    return
+                try:
+                    registry.export_xlsx(excel_path, timeout=0)
+                except LockTimeoutError:
+                    # Another workstation is already exporting the registry
+                    pass
         except Exception as e:
             raise ValueError(f"Nie można zapisać do pliku Excel: {str(e)}")
+
+    @staticmethod
+    def _export_pending(db_path: str, excel_path: str) -> int:
+        """Export rows added since the last export; used by the background flusher."""
+        with SqliteRegistry(db_path) as registry:
+            return registry.export_xlsx(excel_path, timeout=0)
+
+    @staticmethod
+    def flush_registry(excel_path: str) -> int:
+        """Write pending registry rows into the Excel file."""
+        try:
+            # A merge requested in the background may hold the lock for longer than its timeout
+            stop_background_flusher(os.path.abspath(excel_path))
+            db_path = ContractManager.registry_db_path(excel_path)
+            if not db_path:
+                return RegistryWriter(excel_path).flush()
+
+            with SqliteRegistry(db_path) as registry:
+                return registry.export_xlsx(excel_path)
+        except Exception as e:
+            raise ValueError(f"Nie można zapisać do pliku Excel: {str(e)}")
+
+    @staticmethod
+    def recover_registry(excel_path: str) -> int:
+        """Merge journal rows left by a flush interrupted by a crash.
+
+        With the SQLite registry, journal rows left from before the switch
+        are imported into the database.
+        """
+        try:
+            db_path = ContractManager.registry_db_path(excel_path)
+            if not db_path:
+                return RegistryWriter(excel_path).recover()
+            if not RegistryWriter(excel_path).pending_count():
+                return 0
+            return ContractManager.import_registry(excel_path, db_path)
+        except Exception as e:
+            raise ValueError(f"Nie można zapisać do pliku Excel: {str(e)}")
+
+    @staticmethod
+    def iter_registry(excel_path: str) -> Iterator[list]:
+        """Yield all registry rows: archived years, the Excel file and rows not yet written to it."""
+        return ContractManager.query_registry(excel_path)
+
+    @staticmethod
+    def query_registry(excel_path: str, query: RegistryQuery = None) -> Iterator[list]:
+        """Yield registry rows matching the query one at a time.
+
+        The year skips archives of other years and, like gmina and EKO, is
+        handled by SQL in the SQLite registry; remaining conditions are
+        checked row by row as the sheet is streamed.
+        """
+        query = query or RegistryQuery()
+        db_path = ContractManager.registry_db_path(excel_path)
+        if db_path:
+            with SqliteRegistry(db_path) as registry:
+                yield from query.filter(registry.iter_rows(year=query.year, gmina=query.gmina,
+                                                           is_eco=query.is_eco))
+            return
+
+        writer = RegistryWriter(excel_path)
+        yield from query.filter(iter_archives(excel_path, query.year))
+        yield from query.filter(writer.backend.iter_rows(excel_path))
+        yield from query.filter(writer.pending_rows())
+
+    @staticmethod
+    def export_filtered(excel_path: str, output_path: str, query: RegistryQuery = None) -> int:
+        """Write registry rows matching the query to a CSV or Excel file; returns the row count."""
+        try:
+            return export_rows(ContractManager.query_registry(excel_path, query), output_path)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Nie można wyeksportować rejestru: {str(e)}")
+
+    @staticmethod
+    def rollover_registry(excel_path: str, year: str) -> Dict[str, int]:
+        """Archive registry rows of years before ``year``; returns archived rows per year.
+
+        Pending rows are merged first, so the Excel file keeps only the
+        current year and saving a contract never touches the archives. The
+        SQLite registry keeps the rows of every year, so searches and numbering
+        are unchanged; only the exported Excel file leaves archived years out.
+        """
+        try:
+            ContractManager.flush_registry(excel_path)
+            return rollover(excel_path, year)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Nie można zarchiwizować rejestru: {str(e)}")
+
+    @staticmethod
+    def import_registry(excel_path: str, db_path: str) -> int:
+        """Load an existing Excel registry, with rows still waiting in its journal, into the SQLite registry."""
+        stop_background_flusher(os.path.abspath(excel_path))
+        RegistryWriter(excel_path).flush()
+        with SqliteRegistry(db_path) as registry:
+            if registry.pending_export_count():
+                # Rows already in the database reach the Excel file first, so the import can mark all exported
+                registry.export_xlsx(excel_path)
+            return registry.import_xlsx(excel_path)
+
+    @staticmethod
+    def export_registry(db_path: str, excel_path: str) -> int:
+        """Regenerate the whole Excel registry from the SQLite registry, leaving out archived years."""
+        with SqliteRegistry(db_path) as registry:
+            return registry.export_xlsx(excel_path, full=True, skip_years=archive_years(excel_path))
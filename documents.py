@@ -0,0 +1,114 @@
+# documents.py
+"""Atomic contract document writes and the content hash manifest of an output folder."""
+
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import TYPE_CHECKING, Dict
+
+from config import OUTPUT_SETTINGS
+from locking import FileLock
+
+if TYPE_CHECKING:
+    from docxtpl import DocxTemplate
+
+# Prefix of temporary files; never matches CONTRACT_FILE_PATTERN
+TEMP_PREFIX = ".~"
+
+
+def content_hash(template_sha256: str, context: dict) -> str:
+    """Hash identifying a rendered contract by its template and template data.
+
+    Saved .docx files embed write timestamps, so the inputs are hashed
+    rather than the output bytes.
+    """
+    digest = hashlib.sha256(template_sha256.encode("ascii"))
+    digest.update(json.dumps(context, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def save_document(doc: "DocxTemplate", output_path: str) -> int:
+    """Write a document to a temporary file and rename it over output_path; returns its size.
+
+    A crash leaves only the temporary file, never a truncated contract under
+    the final name.
+    """
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    data = buffer.getvalue()
+
+    folder, filename = os.path.split(output_path)
+    tmp_path = os.path.join(folder, f"{TEMP_PREFIX}{filename}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(data)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return len(data)
+
+
+class ContentManifest:
+    """Content hash of every contract in a folder, kept in an append-only JSON lines file.
+
+    Later lines override earlier ones. Each process caches the parsed file
+    and reads only lines appended since its last look.
+    """
+
+    _cache: Dict[str, tuple] = {}
+    _cache_lock = threading.Lock()
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.path = os.path.join(folder, OUTPUT_SETTINGS["manifest_filename"])
+
+    def hashes(self) -> Dict[str, str]:
+        """Recorded hash per contract file name; the shared cached dict, not to be modified."""
+        key = os.path.abspath(self.path)
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return {}
+
+        with self._cache_lock:
+            offset, hashes = self._cache.get(key, (0, {}))
+            if size < offset:
+                # Replaced or truncated; read from the start
+                offset, hashes = 0, {}
+            if size > offset:
+                with open(self.path, 'rb') as manifest:
+                    manifest.seek(offset)
+                    data = manifest.read()
+                # Ignore a line torn by a crash; it is read again once completed
+                complete = data[:data.rfind(b"\n") + 1]
+                for line in complete.splitlines():
+                    try:
+                        entry = json.loads(line)
+                        hashes[entry["file"]] = entry["sha256"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                offset += len(complete)
+                self._cache[key] = (offset, hashes)
+            return hashes
+
+    def record(self, entries: Dict[str, str]):
+        """Append content hashes of written files."""
+        if not entries:
+            return
+        lines = "".join(json.dumps({"file": filename, "sha256": digest}, ensure_ascii=False) + "\n"
+                        for filename, digest in entries.items())
+        with FileLock(self.path + ".lock"):
+            with open(self.path, 'ab+') as manifest:
+                if manifest.tell() > 0:
+                    manifest.seek(-1, os.SEEK_END)
+                    if manifest.read(1) != b"\n":
+                        # Terminate a line torn by a crash so it does not swallow the new one
+                        lines = "\n" + lines
+                manifest.write(lines.encode("utf-8"))
+                manifest.flush()
+                os.fsync(manifest.fileno())
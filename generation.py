@@ -0,0 +1,151 @@
+# generation.py
+"""Single contract generation pipeline shared by the GUI, benchmarks and headless callers."""
+
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+from config import INSTRUMENTATION_SETTINGS, PDF_SETTINGS
+from contract_data import ContractData, ContractManager
+from documents import ContentManifest, content_hash, save_document
+from instrumentation import PipelineMetrics
+from layout import contract_dir
+from pdf import PdfConverter, get_converter
+from registry import registry_row
+from registry_query import RegistryQuery
+from template_cache import TemplateCache
+from validators import ContractValidator
+
+
+class ContractSavedError(ValueError):
+    """The contract was saved and registered, but a later step failed; it must not be issued again."""
+
+    def __init__(self, message: str, filename: str, row: list):
+        super().__init__(message)
+        self.filename = filename
+        self.row = row
+
+
+class ContractNotRegisteredError(ValueError):
+    """The contract was saved under its number but not added to the registry; retry with that number."""
+
+    def __init__(self, message: str, contract_number: int, year: str):
+        super().__init__(message)
+        self.contract_number = contract_number
+        self.year = year
+
+
+class ContractWriter:
+    """Numbers, renders and saves contracts with a warm template cache and PDF converter.
+
+    Not thread safe; callers run it on a single worker thread.
+    """
+
+    def __init__(self, template_cache: TemplateCache = None, metrics: PipelineMetrics = None,
+                 pdf_enabled: bool = None):
+        self.template_cache = template_cache or TemplateCache()
+        self.metrics = metrics or PipelineMetrics()
+        self.pdf_enabled = PDF_SETTINGS["enabled"] if pdf_enabled is None else pdf_enabled
+        self.pdf_converter: Optional[PdfConverter] = None
+
+    def write(self, contract_data: ContractData, paths: dict, year: str = None,
+              contract_number: int = None) -> Tuple[str, dict]:
+        """Number, render and save a contract and add it to the registry.
+
+        ``paths`` holds template, contracts, excel and excel_file. Returns the
+        file name and the template data. A retry after
+        ContractNotRegisteredError passes the number and year it carries; the
+        document saved then is kept when its content is unchanged and only
+        the registry row is added.
+        """
+        year = year or datetime.now().strftime("%Y")
+        retried = contract_number is not None
+        with self.metrics.trace(contract_data.name, profile=INSTRUMENTATION_SETTINGS["profile"]) as trace:
+            try:
+                # Validate paths
+                with trace.stage("paths"):
+                    ContractValidator.validate_paths(paths["template"], [paths["contracts"], paths["excel"]])
+
+                # Reserve next contract number
+                if not retried:
+                    with trace.stage("numbering"):
+                        contract_number = ContractManager.reserve_contract_number(
+                            paths["contracts"],
+                            contract_data.gmina,
+                            year,
+                            excel_path=paths["excel_file"]
+                        )
+
+                try:
+                    # Generate contract
+                    template_data = contract_data.to_dict(contract_number, year)
+                    with trace.stage("template"):
+                        template = self.template_cache.get(paths["template"])
+                    filename = ContractManager.contract_filename(
+                        contract_number, year, contract_data.gmina, contract_data.name)
+                    output_dir = contract_dir(paths["contracts"], year, contract_data.gmina)
+                    os.makedirs(output_dir, exist_ok=True)
+                    output_path = os.path.join(output_dir, filename)
+                    digest = content_hash(template.sha256, template_data)
+                    manifest = ContentManifest(output_dir)
+
+                    if not (retried and manifest.hashes().get(filename) == digest
+                            and os.path.isfile(output_path)):
+                        with trace.stage("render"):
+                            doc = template.render(template_data)
+
+                        # Save contract
+                        with trace.stage("save"):
+                            trace.count("bytes_written", save_document(doc, output_path))
+                except Exception:
+                    if not retried:
+                        ContractManager.release_contract_number(
+                            paths["contracts"], contract_data.gmina, year, contract_number,
+                            excel_path=paths["excel_file"])
+                    raise
+            except Exception as e:
+                raise ValueError(f"Umowa dla {contract_data.name}: {str(e)}") from e
+
+            try:
+                # Lets a retry and rerender skip this contract until the template changes
+                manifest.record({filename: digest})
+            except (OSError, ValueError):
+                # A missing hash only makes this contract render again
+                pass
+
+            try:
+                # Save to Excel
+                with trace.stage("registry"):
+                    if not (retried and self._is_registered(template_data, paths["excel_file"])):
+                        ContractManager.save_to_excel(template_data, paths["excel_file"])
+            except Exception as e:
+                raise ContractNotRegisteredError(
+                    f"Umowa {filename} została zapisana, ale nie dodano jej do rejestru: {str(e)}",
+                    contract_number, year) from e
+
+            if self.pdf_enabled:
+                try:
+                    # The converter stays warm between contracts
+                    with trace.stage("pdf"):
+                        if self.pdf_converter is None:
+                            self.pdf_converter = get_converter()
+                        for pdf_file in self.pdf_converter.convert([output_path]):
+                            trace.count("bytes_written", os.path.getsize(pdf_file))
+                except Exception as e:
+                    raise ContractSavedError(f"Umowa {filename} została zapisana, ale nie utworzono PDF: {str(e)}",
+                                             filename, registry_row(template_data)) from e
+
+        return filename, template_data
+
+    @staticmethod
+    def _is_registered(template_data: dict, excel_path: str) -> bool:
+        """True when the registry already has a row with the contract number, e.g. kept in the journal."""
+        number = registry_row(template_data)[1]
+        query = RegistryQuery(year=template_data['rok'], gmina=template_data['gmina'])
+        return any(row[1] == number for row in ContractManager.query_registry(excel_path, query))
+
+    def close(self):
+        """Stop the PDF converter if one was started."""
+        if self.pdf_converter is not None:
+            self.pdf_converter.close()
+            self.pdf_converter = None
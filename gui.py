@@ -5,7 +5,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 from typing import Callable, Any, Dict
-from config import POSTAL_CODES, VALID_GMINAS, GMINA_POSTAL_CODES, GMINA_LOCATIONS, MAIN_LOCATIONS
+from config import POSTAL_CODES, VALID_GMINAS, GMINA_POSTAL_CODES, MAIN_LOCATIONS, REFERENCE_DATA
 
 
 class PathSettings(ttk.LabelFrame):
@@ -43,6 +43,7 @@ class ContractForm(ttk.Frame):
         super().__init__(parent)
         self.data_vars = data_vars
         self.callbacks = callbacks
+        self.location_index = REFERENCE_DATA.location_index
         self._create_widgets()
 
     def _create_widgets(self):
@@ -77,10 +78,11 @@ class ContractForm(ttk.Frame):
         self.city_label = self._add_field("Miasto:", ttk.Label,
                                           {"textvariable": self.data_vars["city"]})
 
-        # Location field (zamiana Entry na Combobox)
+        # Location field (zamiana Entry na Combobox), filtered as you type
         self.location_combo = self._add_field("Miejscowość:", ttk.Combobox,
                                               {"values": [], "width": 40})
         self.location_combo.bind('<<ComboboxSelected>>', self._on_location_select)
+        self.location_combo.bind('<KeyRelease>', self._on_location_typed)
 
         # Street field
         self.street_entry = self._add_field("Ulica:", ttk.Entry,
@@ -118,6 +120,14 @@ class ContractForm(ttk.Frame):
                                  wraplength=500)
         status_label.grid(row=13, column=0, columnspan=2, pady=5)
 
+        # Background generation progress
+        progress_frame = ttk.Frame(self)
+        progress_frame.grid(row=14, column=0, columnspan=2, pady=5)
+        self.progress_bar = ttk.Progressbar(progress_frame, mode="indeterminate", length=200)
+        self.progress_bar.pack(side=tk.LEFT, padx=5)
+        self.progress_label = ttk.Label(progress_frame, text="", foreground='gray')
+        self.progress_label.pack(side=tk.LEFT, padx=5)
+
     def _add_field(self, label: str, widget_class: Any, widget_kwargs: dict = None) -> Any:
         """Helper method to add form fields."""
         widget_kwargs = widget_kwargs or {}
@@ -146,6 +156,7 @@ class ContractForm(ttk.Frame):
             "gmina"].get() else self.data_vars["gmina"].get()
 
         location = self.location_combo.get() if self.location_combo['state'] != 'disabled' else ""
+        location = self.location_index.canonical(selected_gmina, location) or location.strip()
 
         return {
             "data": self.date_entry.get(),
@@ -171,11 +182,18 @@ class ContractForm(ttk.Frame):
         if selected_location == MAIN_LOCATIONS.get(selected_gmina):
             self.location_combo.set('')
 
+    def _on_location_typed(self, event=None):
+        """Narrow the location list to names matching the typed text."""
+        if event is not None and event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        selected_gmina = self.data_vars["gmina"].get().split(':')[0].strip()
+        self.location_combo['values'] = self.location_index.match(selected_gmina, self.location_combo.get())
+
     def update_locations(self, gmina_code: str):
         """Update location combobox values based on selected gmina."""
         if not gmina_code:
             self.location_combo['values'] = []
-            self.location_combo['state'] = 'readonly'
+            self.location_combo['state'] = 'normal'
             return
 
         if gmina_code == "MO":
@@ -184,11 +202,9 @@ class ContractForm(ttk.Frame):
             self.location_combo['state'] = 'disabled'
             return
 
-        locations = [loc for loc in GMINA_LOCATIONS.get(gmina_code, [])
-                     if loc != MAIN_LOCATIONS.get(gmina_code)]
-        self.location_combo['values'] = locations
+        self.location_combo['values'] = self.location_index.match(gmina_code, "")
         self.location_combo.set('')
-        self.location_combo['state'] = 'readonly'
+        self.location_combo['state'] = 'normal'
 
     def clear_fields(self):
         """Clear all form fields."""
@@ -202,6 +218,38 @@ class ContractForm(ttk.Frame):
         self.data_vars["city"].set("")
         self.location_combo.set("")
 
+    def set_values(self, values: dict):
+        """Fill the form with values as returned by get_values, e.g. of a contract that failed."""
+        self.clear_fields()
+        self.date_entry.delete(0, tk.END)
+        self.date_entry.insert(0, values["data"])
+
+        gmina = values["gmina"]
+        self.data_vars["gmina"].set(f"{gmina}: {VALID_GMINAS.get(gmina, '')}")
+        self.callbacks["on_gmina_select"]()
+        self.data_vars["postal"].set(values["kod_pocztowy"])
+        self.data_vars["city"].set(values["miasto"])
+        if self.location_combo['state'] != 'disabled':
+            self.location_combo.set(values["miejscowosc"])
+
+        entries = [(self.name_entry, "nazwa"), (self.nip_entry, "nip"), (self.street_entry, "ulica"),
+                   (self.house_entry, "numer_domu"), (self.email_entry, "email"), (self.phone_entry, "tel")]
+        for entry, key in entries:
+            value = values.get(key) or ""
+            if key in ("email", "tel") and value == "-":
+                value = ""
+            entry.insert(0, value)
+        self.eco_combo.set(values.get("is_eco") or "nie")
+
+    def show_progress(self, pending: int):
+        """Show how many contracts are still being written in the background."""
+        if pending:
+            self.progress_bar.start(15)
+            self.progress_label['text'] = f"Zapisywanie w tle: {pending}"
+        else:
+            self.progress_bar.stop()
+            self.progress_label['text'] = ""
+
     def update_postal_codes(self, allowed_codes: list):
         """Update postal code combobox values based on selected gmina."""
         postal_values = [f"{code}: {POSTAL_CODES[code]}" for code in allowed_codes]
@@ -213,3 +261,71 @@ class ContractForm(ttk.Frame):
             self.callbacks["on_postal_select"]()
         elif len(postal_values) > 1:
             self.postal_combo.set('')
+
+
+class SearchPanel(ttk.LabelFrame):
+    """Search over issued contracts by name, NIP or address."""
+
+    columns = ("numer", "nazwa", "nip", "adres")
+
+    def __init__(self, parent, on_search: Callable[[str], list]):
+        super().__init__(parent, text="Wyszukiwanie klientów", padding="5")
+        self.on_search = on_search
+        self.query_var = tk.StringVar()
+        self.info_var = tk.StringVar(value="Wczytywanie rejestru...")
+        self._create_widgets()
+
+    def _create_widgets(self):
+        """Create search widgets."""
+        ttk.Label(self, text="Nazwa lub NIP:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        entry = ttk.Entry(self, textvariable=self.query_var, width=30)
+        entry.grid(row=0, column=1, sticky='ew', pady=2, padx=5)
+        self.query_var.trace_add("write", lambda *args: self.refresh())
+
+        self.results = ttk.Treeview(self, columns=self.columns, show="headings", height=20)
+        for column, heading, width in zip(self.columns, ("Numer", "Nazwa", "NIP", "Adres"),
+                                          (90, 160, 90, 180)):
+            self.results.heading(column, text=heading)
+            self.results.column(column, width=width)
+        self.results.grid(row=1, column=0, columnspan=2, sticky='nsew', pady=5)
+
+        ttk.Label(self, textvariable=self.info_var, foreground='gray').grid(
+            row=2, column=0, columnspan=2, sticky=tk.W)
+
+        self.columnconfigure(1, weight=1)
+        self.rowconfigure(1, weight=1)
+
+    def refresh(self):
+        """Show rows matching the current query."""
+        self.results.delete(*self.results.get_children())
+        query = self.query_var.get().strip()
+        if not query:
+            return
+
+        for row in self.on_search(query):
+            address = f"{row[5]} {row[7] or row[6]}, {row[8]} {row[9]}"
+            self.results.insert("", tk.END, values=(row[1], row[3], row[4] or "", address))
+
+    def set_info(self, text: str):
+        """Show a status line below the results."""
+        self.info_var.set(text)
+
+
+class MetricsWindow(tk.Toplevel):
+    """Debug window with per-stage generation timings."""
+
+    def __init__(self, parent, get_summary: Callable[[], str]):
+        super().__init__(parent)
+        self.title("Czasy generowania")
+        self.get_summary = get_summary
+        self.text = tk.Text(self, width=60, height=20, font='TkFixedFont')
+        self.text.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)
+        ttk.Button(self, text="Odśwież", command=self.refresh).grid(row=1, column=0, pady=5)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+        self.refresh()
+
+    def refresh(self):
+        """Show the current summary."""
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, self.get_summary())
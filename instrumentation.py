@@ -0,0 +1,161 @@
+# instrumentation.py
+"""Per-stage timing and counters for contract generation, with rolling percentiles."""
+
+import cProfile
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+from config import INSTRUMENTATION_SETTINGS
+
+_current = threading.local()
+
+
+class GenerationTrace:
+    """Stage durations and counters of a single generation."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages: Dict[str, float] = {}
+        self.counters: Counter = Counter()
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Time a stage; repeated stages add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - start
+
+    def count(self, counter: str, value: int = 1):
+        """Add to a counter such as bytes written or files scanned."""
+        self.counters[counter] += value
+
+
+class PipelineMetrics:
+    """Rolling window of stage durations over the last generations.
+
+    Every finished trace is appended to the log file together with the
+    current p50/p95 of each stage, so a slow share, registry or template can
+    be told apart on a given workstation.
+    """
+
+    def __init__(self, window: int = None, log_file: Optional[str] = None):
+        window = window or INSTRUMENTATION_SETTINGS["window"]
+        self.log_file = log_file
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._counters: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name: str, profile: bool = False) -> Iterator[GenerationTrace]:
+        """Collect a generation trace for the current thread, optionally under cProfile."""
+        trace = GenerationTrace(name)
+        profiler = cProfile.Profile() if profile else None
+        previous = getattr(_current, "trace", None)
+        _current.trace = trace
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield trace
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            trace.stages["total"] = time.perf_counter() - start
+            _current.trace = previous
+            self.record(trace)
+            if profiler is not None:
+                self._dump_profile(profiler, name)
+
+    def record(self, trace: GenerationTrace):
+        """Add a finished trace to the rolling window and the log file."""
+        with self._lock:
+            for stage, elapsed in trace.stages.items():
+                self._samples[stage].append(elapsed)
+            self._counters.update(trace.counters)
+            summary = self._summary()
+
+        if self.log_file:
+            try:
+                with open(self.log_file, 'a', encoding='utf-8') as log:
+                    log.write(self._log_line(trace, summary))
+            except OSError:
+                # Timing must never break generation
+                pass
+
+    def summary(self) -> Dict[str, Tuple[int, float, float]]:
+        """Sample count, p50 and p95 in seconds for every stage."""
+        with self._lock:
+            return self._summary()
+
+    def counters(self) -> Dict[str, int]:
+        """Counter totals since start."""
+        with self._lock:
+            return dict(self._counters)
+
+    def format_summary(self) -> str:
+        """Human readable table of stage percentiles and counters."""
+        lines = [f"{'etap':<16} {'n':>5} {'p50 [ms]':>10} {'p95 [ms]':>10}"]
+        for stage, (count, p50, p95) in self.summary().items():
+            lines.append(f"{stage:<16} {count:>5} {p50 * 1000:>10.1f} {p95 * 1000:>10.1f}")
+        for counter, value in sorted(self.counters().items()):
+            lines.append(f"{counter}: {value}")
+        return "\n".join(lines)
+
+    def _summary(self) -> Dict[str, Tuple[int, float, float]]:
+        """Percentiles of the samples; the caller holds the lock."""
+        summary = {}
+        for stage, samples in self._samples.items():
+            ordered = sorted(samples)
+            summary[stage] = (len(ordered), _percentile(ordered, 0.5), _percentile(ordered, 0.95))
+        return summary
+
+    @staticmethod
+    def _log_line(trace: GenerationTrace, summary: Dict[str, Tuple[int, float, float]]) -> str:
+        """One log line with the trace and the rolling percentiles."""
+        stages = " ".join(
+            f"{stage}={elapsed * 1000:.1f}ms(p50={summary[stage][1] * 1000:.1f},p95={summary[stage][2] * 1000:.1f})"
+            for stage, elapsed in trace.stages.items()
+        )
+        counters = " ".join(f"{counter}={value}" for counter, value in sorted(trace.counters.items()))
+        return f"{datetime.now():%Y-%m-%d %H:%M:%S} {trace.name} {stages} {counters}".rstrip() + "\n"
+
+    @staticmethod
+    def _dump_profile(profiler: cProfile.Profile, name: str):
+        """Save profiler stats for one generation."""
+        try:
+            os.makedirs(INSTRUMENTATION_SETTINGS["profile_dir"], exist_ok=True)
+            safe_name = "".join(char if char.isalnum() else "_" for char in name)[:40]
+            profiler.dump_stats(os.path.join(INSTRUMENTATION_SETTINGS["profile_dir"],
+                                             f"{datetime.now():%Y%m%d_%H%M%S_%f}_{safe_name}.prof"))
+        except OSError:
+            pass
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the trace collected on this thread, if any."""
+    trace = getattr(_current, "trace", None)
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+def count(counter: str, value: int = 1):
+    """Add to a counter of the trace collected on this thread, if any."""
+    trace = getattr(_current, "trace", None)
+    if trace is not None:
+        trace.count(counter, value)
@@ -0,0 +1,71 @@
+# layout.py
+"""Directory layout of generated contracts: flat or sharded by year and gmina."""
+
+import json
+import os
+import re
+from typing import Optional
+
+from config import OUTPUT_SETTINGS
+from documents import ContentManifest
+
+CONTRACT_FILE_PATTERN = re.compile(r"Umowa_(\d+)_(\d{4})_([^_]+)_")
+
+LAYOUTS = ("flat", "year_gmina")
+
+
+def output_layout(contracts_dir: str) -> str:
+    """Layout recorded in the contracts folder, or the configured default.
+
+    The marker lives in the shared folder, so every workstation switches to
+    the sharded layout as soon as the folder is migrated.
+    """
+    try:
+        with open(os.path.join(contracts_dir, OUTPUT_SETTINGS["layout_marker"]), encoding='utf-8') as marker:
+            layout = json.load(marker)["layout"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return OUTPUT_SETTINGS["layout"]
+    return layout if layout in LAYOUTS else OUTPUT_SETTINGS["layout"]
+
+
+def contract_dir(contracts_dir: str, year: str, gmina: str, layout: Optional[str] = None) -> str:
+    """Folder holding the contracts of a year and gmina."""
+    if (layout or output_layout(contracts_dir)) == "year_gmina":
+        return os.path.join(contracts_dir, str(year), gmina)
+    return contracts_dir
+
+
+def migrate_to_shards(contracts_dir: str) -> int:
+    """Move contracts from the flat folder into <rok>/<gmina> folders in one pass.
+
+    The marker is written first so that contracts generated during the
+    migration already go to the shards. Content hashes move with the files.
+    Returns the number of files moved.
+    """
+    with open(os.path.join(contracts_dir, OUTPUT_SETTINGS["layout_marker"]), 'w', encoding='utf-8') as marker:
+        json.dump({"layout": "year_gmina"}, marker)
+
+    known_hashes = ContentManifest(contracts_dir).hashes()
+    moved_hashes = {}
+    created = set()
+    moved = 0
+    with os.scandir(contracts_dir) as entries:
+        for entry in entries:
+            match = CONTRACT_FILE_PATTERN.match(entry.name)
+            if not match or not entry.is_file():
+                continue
+            shard = contract_dir(contracts_dir, match.group(2), match.group(3), "year_gmina")
+            if shard not in created:
+                os.makedirs(shard, exist_ok=True)
+                created.add(shard)
+            target = os.path.join(shard, entry.name)
+            if os.path.exists(target):
+                raise ValueError(f"Plik {entry.name} istnieje już w folderze {shard}")
+            os.replace(entry.path, target)
+            moved += 1
+            if entry.name in known_hashes:
+                moved_hashes.setdefault(shard, {})[entry.name] = known_hashes[entry.name]
+
+    for shard, hashes in moved_hashes.items():
+        ContentManifest(shard).record(hashes)
+    return moved
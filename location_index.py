@@ -0,0 +1,65 @@
+# location_index.py
+"""Per-gmina prefix index over locality names for type-ahead filtering."""
+
+import bisect
+from typing import Dict, List, Optional
+
+from normalization import normalize
+
+
+class LocationIndex:
+    """Sorted normalized keys per gmina, searched with bisect.
+
+    Every word start of a locality name is indexed, so "wielkie" finds
+    "Gorzyce Wielkie" and "lodz" finds "Łódź".
+    """
+
+    def __init__(self, gmina_locations: Dict[str, List[str]], main_locations: Dict[str, str] = None):
+        main_locations = main_locations or {}
+        self._locations: Dict[str, List[str]] = {}
+        self._keys: Dict[str, List[str]] = {}
+        self._names: Dict[str, List[str]] = {}
+        self._canonical: Dict[str, Dict[str, str]] = {}
+
+        for gmina, locations in gmina_locations.items():
+            normalized = {location: normalize(location) for location in locations
+                          if location != main_locations.get(gmina)}
+            entries = sorted(
+                (key, name)
+                for name, normalized_name in normalized.items()
+                for key in self._word_suffixes(normalized_name)
+            )
+            self._locations[gmina] = sorted(normalized, key=normalized.get)
+            self._keys[gmina] = [key for key, _ in entries]
+            self._names[gmina] = [name for _, name in entries]
+            self._canonical[gmina] = {normalized_name: name for name, normalized_name in normalized.items()}
+
+    def locations(self, gmina: str) -> List[str]:
+        """All localities of a gmina in alphabetical order."""
+        return self._locations.get(gmina, [])
+
+    def match(self, gmina: str, text: str, limit: int = 100) -> List[str]:
+        """Localities with a word starting with the typed text, ignoring case and diacritics."""
+        prefix = normalize(text)
+        if not prefix:
+            return self.locations(gmina)[:limit]
+
+        keys = self._keys.get(gmina, [])
+        names = self._names.get(gmina, [])
+        matches = []
+        position = bisect.bisect_left(keys, prefix)
+        while position < len(keys) and keys[position].startswith(prefix) and len(matches) < limit:
+            if names[position] not in matches:
+                matches.append(names[position])
+            position += 1
+        return matches
+
+    def canonical(self, gmina: str, text: str) -> Optional[str]:
+        """Locality name as spelled in the reference data, if the text names one."""
+        return self._canonical.get(gmina, {}).get(normalize(text))
+
+    @staticmethod
+    def _word_suffixes(key: str) -> List[str]:
+        """Key suffixes starting at each word of a normalized name."""
+        words = key.split()
+        return [" ".join(words[index:]) for index in range(len(words))]
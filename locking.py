@@ -0,0 +1,155 @@
+# locking.py
+"""Cross-process file locks usable on local disks and network shares."""
+
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from config import LOCK_SETTINGS
+
+
+class LockTimeoutError(ValueError):
+    """Raised when a lock could not be acquired in time."""
+
+
+class FileLock:
+    """Lock based on exclusive creation of a lock file.
+
+    O_CREAT | O_EXCL is atomic on NTFS, SMB shares and POSIX filesystems, so the
+    lock works between processes on different workstations. A lock held by the
+    same owner for ``stale_after`` seconds, as timed by this process, or one
+    owned by a process of this computer that no longer runs, is treated as
+    left behind by a crashed process. File times are not used because they
+    come from the clock of the file server.
+    """
+
+    # Lock path -> (owner, monotonic time this process first saw that owner);
+    # kept across acquisitions so that waiting can outlast a single timeout
+    _observed: Dict[str, Tuple[str, float]] = {}
+
+    def __init__(self, path: str, timeout: float = None, stale_after: float = None):
+        self.path = path
+        self.timeout = LOCK_SETTINGS["timeout"] if timeout is None else timeout
+        self.stale_after = LOCK_SETTINGS["stale_after"] if stale_after is None else stale_after
+        self._locked = False
+        self._owner = ""
+
+    def acquire(self):
+        """Wait until the lock file can be created."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._break_if_stale()
+                if time.monotonic() >= deadline:
+                    raise LockTimeoutError(
+                        f"Plik jest zablokowany przez innego użytkownika: {self.path}"
+                    )
+                time.sleep(LOCK_SETTINGS["poll_interval"])
+                continue
+
+            # The token tells this holder apart from a later lock of the same process
+            self._owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+            with os.fdopen(fd, 'w') as lock_file:
+                lock_file.write(self._owner)
+            self._locked = True
+            return
+
+    def release(self):
+        """Remove the lock file unless it was broken as stale and taken by someone else."""
+        if self._locked:
+            self._locked = False
+            if self._read_owner(self.path) != self._owner:
+                return
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _break_if_stale(self):
+        """Remove a lock file left behind by a crashed process."""
+        owner = self._read_owner(self.path)
+        if owner is None:
+            return
+        key = os.path.abspath(self.path)
+        now = time.monotonic()
+        seen_owner, first_seen = self._observed.get(key, (None, now))
+        if seen_owner != owner:
+            first_seen = now
+            self._observed[key] = (owner, now)
+
+        host, _, pid = owner.partition(":")
+        pid = pid.partition(":")[0]
+        owner_gone = host == socket.gethostname() and pid.isdigit() and not _process_alive(int(pid))
+        if owner_gone or now - first_seen > self.stale_after:
+            self._break(owner)
+            self._observed.pop(key, None)
+
+    def _break(self, owner: str):
+        """Move the lock aside under a unique name and delete it if it still belongs to owner.
+
+        Renaming is atomic, so of several waiters breaking the same lock only
+        one gets it. A waiter that judged an older lock and moved a new one
+        instead puts it back.
+        """
+        moved = f"{self.path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(self.path, moved)
+        except OSError:
+            return
+        if self._read_owner(moved) == owner:
+            os.remove(moved)
+            return
+        try:
+            # Both fail if the lock file was created again meanwhile
+            if os.name == "nt":
+                os.rename(moved, self.path)
+            else:
+                os.link(moved, self.path)
+                os.remove(moved)
+        except OSError:
+            os.remove(moved)
+
+    @staticmethod
+    def _read_owner(path: str) -> Optional[str]:
+        """Owner written into a lock file, None when it cannot be read."""
+        try:
+            with open(path, encoding='utf-8') as lock_file:
+                return lock_file.read()
+        except OSError:
+            return None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def _process_alive(pid: int) -> bool:
+    """Check whether a process of this computer is still running."""
+    if os.name == "nt":
+        # os.kill would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return kernel32.GetLastError() == 5  # ERROR_ACCESS_DENIED: exists but not ours
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -3,14 +3,22 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-from docxtpl import DocxTemplate
+import importlib
 import os
-from datetime import datetime
 
-from config import DEFAULT_PATHS, POSTAL_CODES, VALID_GMINAS, GMINA_POSTAL_CODES
-from gui import PathSettings, ContractForm
+from config import (DEFAULT_PATHS, POSTAL_CODES, VALID_GMINAS, GMINA_POSTAL_CODES, INSTRUMENTATION_SETTINGS,
+                    SERVICE_SETTINGS)
+from gui import PathSettings, ContractForm, SearchPanel, MetricsWindow
+from instrumentation import PipelineMetrics
 from validators import ContractValidator
 from contract_data import ContractData, ContractManager
+from generation import ContractNotRegisteredError, ContractSavedError, ContractWriter
+from registry import registry_row
+from search_index import CustomerIndex
+from template_cache import TemplateCache
+from worker import GenerationWorker
+
+PREWARM_DELAY_MS = 500
 
 
 class ContractGeneratorApp:
@@ -19,7 +27,7 @@ class ContractGeneratorApp:
     def __init__(self, root: tk.Tk):
         self.root = root
         self.root.title("Generator Umów")
-        self.root.geometry("800x900")
+        self.root.geometry("1400x900")
 
         default_font = ('TkDefaultFont', 12)  # zwiększenie z domyślnego 9/10 na 12
         self.root.option_add('*Font', default_font)
@@ -34,8 +42,81 @@ class ContractGeneratorApp:
         # Initialize components
         self.validator = ContractValidator()
         self.contract_manager = ContractManager()
+        self.template_cache = TemplateCache()
+        self.customer_index = None
+        self._rows_added_while_loading = []
+        self.metrics = PipelineMetrics(log_file=INSTRUMENTATION_SETTINGS["log_file"] or None)
+        self.contract_writer = ContractWriter(self.template_cache, self.metrics)
+        # Thin client mode: generation, numbering and search happen in the shared service
+        self.service_client = None
+        if SERVICE_SETTINGS["url"]:
+            from service import ServiceClient
+            self.service_client = ServiceClient(SERVICE_SETTINGS["url"])
 
         self._setup_main_window()
+        self.worker = GenerationWorker(
+            self.root,
+            on_done=self._on_contract_written,
+            on_error=self._on_contract_failed,
+            on_pending=self.contract_form.show_progress
+        )
+        self.loader = GenerationWorker(
+            self.root,
+            on_done=self._on_index_loaded,
+            on_error=lambda e: self.search_panel.set_info(str(e))
+        )
+        self.root.protocol("WM_DELETE_WINDOW", self._on_exit)
+        self.root.bind("<F12>", lambda event: MetricsWindow(self.root, self.metrics.format_summary))
+        self.root.after(PREWARM_DELAY_MS, self._start_prewarm)
+
+    def _start_prewarm(self):
+        """Load heavy libraries and the customer index in the background once the window is shown."""
+        if self.service_client is not None:
+            self.search_panel.set_info(f"Usługa: {self.service_client.base_url}")
+            return
+        template_path = self.path_vars["template"].get()
+        excel_path = self._excel_path()
+        self.loader.submit(lambda: self._prewarm(template_path, excel_path))
+
+    def _prewarm(self, template_path: str, excel_path: str) -> CustomerIndex:
+        """Import openpyxl, load the template, replay an interrupted flush and index the registry.
+
+        Runs on the loader thread.
+        """
+        try:
+            importlib.import_module("openpyxl")
+            if os.path.isfile(template_path):
+                self.template_cache.get(template_path)
+        except Exception:
+            # Pre-warming is best effort; errors surface again during generation
+            pass
+
+        try:
+            self.contract_manager.recover_registry(excel_path)
+            return CustomerIndex(self.contract_manager.iter_registry(excel_path))
+        except Exception as e:
+            raise ValueError(f"Nie można wczytać rejestru: {str(e)}") from e
+
+    def _on_index_loaded(self, index: CustomerIndex):
+        """Start using the customer index loaded in the background."""
+        for row in self._rows_added_while_loading:
+            index.add(row)
+        self._rows_added_while_loading = []
+        self.customer_index = index
+        self.search_panel.set_info(f"Umów w rejestrze: {len(index)}")
+        self.search_panel.refresh()
+
+    def _search_customers(self, query: str) -> list:
+        """Search the customer index."""
+        if self.service_client is not None:
+            try:
+                return self.service_client.search(query)
+            except ValueError as e:
+                self.search_panel.set_info(str(e))
+                return []
+        if self.customer_index is None:
+            return []
+        return self.customer_index.search(query)
 
     def _init_path_vars(self):
         """Initialize path-related variables."""
@@ -77,11 +158,17 @@ class ContractGeneratorApp:
             "on_gmina_select": self._on_gmina_select,
             "on_postal_select": self._on_postal_select,
             "generate": self._generate_contract,
-            "exit": self.root.quit
+            "exit": self._on_exit
         }
         self.contract_form = ContractForm(main_frame, self.data_vars, form_callbacks)
         self.contract_form.grid(row=2, column=0, sticky='nsew')
 
+        # Create customer search
+        self.search_panel = SearchPanel(main_frame, self._search_customers)
+        self.search_panel.grid(row=0, column=1, rowspan=3, sticky='nsew', padx=(10, 0))
+        main_frame.columnconfigure(1, weight=1)
+        main_frame.rowconfigure(2, weight=1)
+
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
@@ -132,41 +219,33 @@ class ContractGeneratorApp:
             self.data_vars["postal"].set(postal_code)
             self.data_vars["city"].set(POSTAL_CODES.get(postal_code, ""))
 
-    def _generate_contract(self):
-        """Generate the contract document."""
+    def _excel_path(self) -> str:
+        """Path of the Excel registry in the selected folder."""
+        return os.path.join(self.path_vars["excel"].get(), DEFAULT_PATHS["excel_filename"])
+
+    def _on_exit(self):
+        """Wait for background jobs, merge pending registry rows and close the application."""
+        if self.worker.pending:
+            self.data_vars["status"].set("Oczekiwanie na zapisanie umów...")
+            self.root.after(200, self._on_exit)
+            return
+
         try:
-            # Validate paths
-            self.validator.validate_paths(
-                self.path_vars["template"].get(),
-                [self.path_vars["contracts"].get(), self.path_vars["excel"].get()]
-            )
+            if self.service_client is None:
+                self.contract_manager.flush_registry(self._excel_path())
+            self.contract_writer.close()
+        except Exception as e:
+            messagebox.showerror("Błąd", str(e))
+        self.root.quit()
 
+    def _generate_contract(self):
+        """Validate the form and queue the contract for background generation."""
+        try:
             # Get form values
             values = self.contract_form.get_values()
-            year = datetime.now().strftime("%Y")
-
-            # Get next contract number
-            contract_number = self.contract_manager.get_next_contract_number(
-                self.path_vars["contracts"].get(),
-                values["gmina"],
-                year
-            )
 
             # Create contract data
-            contract_data = ContractData(
-                date=values["data"],
-                gmina=values["gmina"],
-                name=values["nazwa"],
-                postal_code=values["kod_pocztowy"],
-                city=values["miasto"],
-                location=values["miejscowosc"],
-                street=values["ulica"],
-                house_number=values["numer_domu"],
-                email=values["email"],
-                phone=values["tel"],
-                is_eco=values["is_eco"],
-                nip=values["nip"]
-            )
+            contract_data = ContractData.from_dict(values)
 
             # Validate data
             self.validator.validate_required_fields(contract_data)
@@ -175,30 +254,127 @@ class ContractGeneratorApp:
                 contract_data.postal_code,
                 GMINA_POSTAL_CODES
             )
+        except Exception as e:
+            messagebox.showerror("Błąd", str(e))
+            self.data_vars["status"].set("Błąd podczas generowania umowy!")
+            return
 
-            # Generate contract
-            template_data = contract_data.to_dict(contract_number, year)
-            doc = DocxTemplate(self.path_vars["template"].get())
-            doc.render(template_data)
-
-            # Save contract
-            filename = f"Umowa_{contract_number}_{year}_{values['gmina']}_{values['nazwa']}.docx"
-            output_path = os.path.join(self.path_vars["contracts"].get(), filename)
-            doc.save(output_path)
+        if not self._confirm_location(contract_data):
+            return
 
-            # Save to Excel
-            excel_path = os.path.join(
-                self.path_vars["excel"].get(),
-                DEFAULT_PATHS["excel_filename"]
-            )
-            self.contract_manager.save_to_excel(template_data, excel_path)
+        if not self._confirm_duplicates(contract_data):
+            return
 
-            self.data_vars["status"].set(f"Umowa została wygenerowana: {filename}")
+        if self._queue_contract(contract_data):
             self.contract_form.clear_fields()
 
-        except Exception as e:
-            messagebox.showerror("Błąd", str(e))
-            self.data_vars["status"].set("Błąd podczas generowania umowy!")
+    def _queue_contract(self, contract_data: ContractData, contract_number: int = None, year: str = None) -> bool:
+        """Check the paths and queue the contract for the worker; False when the paths are invalid.
+
+        ``contract_number`` and ``year`` retry a contract that was saved but not registered.
+        """
+        paths = {name: var.get() for name, var in self.path_vars.items()}
+        paths["excel_file"] = self._excel_path()
+        if self.service_client is None:
+            try:
+                # Checked here so that the form is kept when a path is wrong
+                self.validator.validate_paths(paths["template"], [paths["contracts"], paths["excel"]])
+            except Exception as e:
+                messagebox.showerror("Błąd", str(e))
+                self.data_vars["status"].set("Błąd podczas generowania umowy!")
+                return False
+
+        self.worker.submit(lambda: self._write_contract(contract_data, paths, contract_number, year),
+                           on_error=lambda error: self._on_contract_failed(error, contract_data))
+        self.data_vars["status"].set(f"Umowa dodana do kolejki: {contract_data.name}")
+        return True
+
+    def _confirm_location(self, contract_data: ContractData) -> bool:
+        """Ask before issuing a contract for a locality typed in that is not listed for the gmina."""
+        if not contract_data.location or self.validator.is_gmina_location(contract_data.gmina,
+                                                                           contract_data.location):
+            return True
+        return messagebox.askyesno(
+            "Nieznana miejscowość",
+            f"Miejscowość {contract_data.location} nie należy do gminy {contract_data.gmina}.\n\n"
+            f"Czy mimo to wygenerować umowę?"
+        )
+
+    def _confirm_duplicates(self, contract_data: ContractData) -> bool:
+        """Ask before issuing a contract for a customer that already has one."""
+        if self.service_client is not None:
+            try:
+                duplicates = self.service_client.find_duplicates(contract_data)
+            except ValueError as e:
+                messagebox.showerror("Błąd", str(e))
+                return False
+        elif self.customer_index is None:
+            return True
+        else:
+            duplicates = self.customer_index.find_duplicates(contract_data)
+        if not duplicates:
+            return True
+
+        listing = "\n".join(f"{row[1]}: {row[3]}, {row[7] or row[6]} {row[8]} {row[9]}"
+                            for row in duplicates[:10])
+        return messagebox.askyesno(
+            "Możliwy duplikat",
+            f"Ten klient może już mieć umowę:\n{listing}\n\nCzy mimo to wygenerować umowę?"
+        )
+
+    def _write_contract(self, contract_data: ContractData, paths: dict, contract_number: int = None,
+                        year: str = None) -> tuple:
+        """Number, render and save a contract; runs on the worker thread."""
+        if self.service_client is not None:
+            result = self.service_client.generate(contract_data, force=True, contract_number=contract_number,
+                                                  year=year)
+            return result["filename"], result["row"]
+
+        filename, template_data = self.contract_writer.write(contract_data, paths, year, contract_number)
+        return filename, registry_row(template_data)
+
+    def _on_contract_written(self, result: tuple):
+        """Report a contract written in the background and add it to the customer index."""
+        filename, row = result
+        if self.customer_index is not None:
+            self.customer_index.add(row)
+            self.search_panel.set_info(f"Umów w rejestrze: {len(self.customer_index)}")
+        elif self.service_client is None:
+            self._rows_added_while_loading.append(row)
+        self.data_vars["status"].set(f"Umowa została wygenerowana: {filename}")
+
+    def _on_contract_failed(self, error: Exception, contract_data: ContractData = None):
+        """Report a background generation failure and offer to retry or restore the form.
+
+        A contract that was saved and registered before the failure is
+        reported as written, since retrying would issue it a second time.
+        """
+        if isinstance(error, ContractSavedError):
+            self._on_contract_written((error.filename, error.row))
+            messagebox.showwarning("Uwaga", str(error))
+            return
+
+        self.data_vars["status"].set("Błąd podczas generowania umowy!")
+        if contract_data is None:
+            messagebox.showerror("Błąd", str(error))
+            return
+
+        if isinstance(error, ContractNotRegisteredError):
+            # The document already has its number; a retry only adds the registry row
+            if messagebox.askretrycancel("Błąd", f"{error}\n\nPonowić dodanie umowy do rejestru?"):
+                if not self._queue_contract(contract_data, error.contract_number, error.year):
+                    self._on_contract_failed(error, contract_data)
+            return
+
+        answer = messagebox.askyesnocancel(
+            "Błąd",
+            f"{error}\n\nTak - spróbuj ponownie\nNie - przywróć dane do formularza\nAnuluj - porzuć dane"
+        )
+        if answer:
+            if not self._queue_contract(contract_data):
+                self.contract_form.set_values(contract_data.to_values())
+        elif answer is not None:
+            self.contract_form.set_values(contract_data.to_values())
 
 
 def main():
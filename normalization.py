@@ -0,0 +1,21 @@
+# normalization.py
+"""Text normalization shared by the search and lookup indexes."""
+
+import re
+import unicodedata
+
+# Letters that do not decompose into a base letter and a combining mark
+_SPECIAL_LETTERS = str.maketrans({"ł": "l", "Ł": "l"})
+
+
+def normalize(text) -> str:
+    """Lowercase text without Polish diacritics, punctuation or repeated spaces."""
+    text = str(text or "").translate(_SPECIAL_LETTERS)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w]+", " ", text.lower()).split())
+
+
+def normalize_nip(nip) -> str:
+    """NIP digits only."""
+    return re.sub(r"\D", "", str(nip or ""))
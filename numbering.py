@@ -0,0 +1,112 @@
+# numbering.py
+"""Persistent per-(year, gmina) contract number index."""
+
+import json
+import os
+from typing import Dict
+
+from config import NUMBERING_SETTINGS
+from instrumentation import count
+from layout import CONTRACT_FILE_PATTERN, contract_dir, output_layout
+from locking import FileLock
+
+
+class ContractNumberIndex:
+    """Highest issued contract number per year and gmina, kept in a JSON sidecar file.
+
+    With the sharded layout a missing index is not rebuilt from the whole
+    tree; a counter missing from the index is read from the one
+    <rok>/<gmina> folder it belongs to.
+    """
+
+    def __init__(self, output_folder: str, layout: str = None):
+        self.output_folder = output_folder
+        self.layout = layout or output_layout(output_folder)
+        self.index_path = os.path.join(output_folder, NUMBERING_SETTINGS["index_filename"])
+
+    def load(self) -> Dict[str, Dict[str, int]]:
+        """Read the index, rebuilding it from the folder when missing or corrupted."""
+        try:
+            with open(self.index_path, encoding='utf-8') as index_file:
+                counters = json.load(index_file)
+            if self._is_valid(counters):
+                return counters
+        except (OSError, ValueError):
+            pass
+        if self.layout == "year_gmina":
+            return {}
+        return self.rebuild()
+
+    def rebuild(self) -> Dict[str, Dict[str, int]]:
+        """Scan the contracts folder once and write a fresh index."""
+        counters = {}
+        files = os.listdir(self.output_folder)
+        count("files_scanned", len(files))
+        for file in files:
+            if match := CONTRACT_FILE_PATTERN.match(file):
+                number, year, gmina = int(match.group(1)), match.group(2), match.group(3)
+                year_counters = counters.setdefault(year, {})
+                year_counters[gmina] = max(year_counters.get(gmina, 0), number)
+
+        self._write(counters)
+        return counters
+
+    def scan_shard(self, gmina: str, year: str) -> int:
+        """Highest contract number in the folder of a year and gmina."""
+        folder = contract_dir(self.output_folder, year, gmina, self.layout)
+        try:
+            files = os.listdir(folder)
+        except FileNotFoundError:
+            return 0
+        count("files_scanned", len(files))
+        numbers = [int(match.group(1)) for file in files
+                   if (match := CONTRACT_FILE_PATTERN.match(file))
+                   and match.group(2) == year and match.group(3) == gmina]
+        return max(numbers, default=0)
+
+    def last_number(self, counters: Dict[str, Dict[str, int]], gmina: str, year: str) -> int:
+        """Highest issued number, read from the shard when the index has no counter for it."""
+        year_counters = counters.get(year, {})
+        if gmina not in year_counters and self.layout == "year_gmina":
+            return self.scan_shard(gmina, year)
+        return year_counters.get(gmina, 0)
+
+    def next_number(self, gmina: str, year: str) -> int:
+        """Get the next free contract number for the given year and gmina."""
+        return self.last_number(self.load(), gmina, year) + 1
+
+    def reserve(self, gmina: str, year: str, count: int = 1) -> int:
+        """Allocate ``count`` consecutive numbers under a cross-process lock and return the first."""
+        with FileLock(self.index_path + ".lock"):
+            counters = self.load()
+            number = self.last_number(counters, gmina, year) + 1
+            counters.setdefault(year, {})[gmina] = number + count - 1
+            self._write(counters)
+        return number
+
+    def release(self, gmina: str, year: str, number: int, count: int = 1):
+        """Give back reserved numbers if no later number was allocated meanwhile."""
+        with FileLock(self.index_path + ".lock"):
+            counters = self.load()
+            year_counters = counters.get(year, {})
+            if year_counters.get(gmina) == number + count - 1:
+                year_counters[gmina] = number - 1
+                self._write(counters)
+
+    def _write(self, counters: Dict[str, Dict[str, int]]):
+        """Replace the index file atomically."""
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as index_file:
+            json.dump(counters, index_file, ensure_ascii=False, indent=2)
+            index_file.flush()
+            os.fsync(index_file.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _is_valid(counters) -> bool:
+        """Check the structure of a loaded index."""
+        return isinstance(counters, dict) and all(
+            isinstance(year_counters, dict)
+            and all(isinstance(number, int) for number in year_counters.values())
+            for year_counters in counters.values()
+        )
@@ -0,0 +1,205 @@
+# pdf.py
+"""Optional PDF conversion of generated contracts through a long-lived converter."""
+
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+from config import PDF_SETTINGS
+
+
+def pdf_path(docx_path: str) -> str:
+    """PDF file written next to a contract document."""
+    return os.path.splitext(docx_path)[0] + ".pdf"
+
+
+class PdfConverter(ABC):
+    """Converts .docx contracts to PDF files saved next to them."""
+
+    @abstractmethod
+    def convert(self, docx_paths: List[str]) -> List[str]:
+        """Convert a batch of documents and return the PDF paths in the same order."""
+
+    def close(self):
+        """Stop helper processes started by the converter."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class StubConverter(PdfConverter):
+    """Writes a minimal PDF without LibreOffice; records the batches it was given."""
+
+    def __init__(self):
+        self.batches: List[List[str]] = []
+
+    def convert(self, docx_paths: List[str]) -> List[str]:
+        self.batches.append(list(docx_paths))
+        outputs = []
+        for docx_path in docx_paths:
+            if not os.path.isfile(docx_path):
+                raise ValueError(f"Nie znaleziono pliku {docx_path}")
+            output_path = pdf_path(docx_path)
+            with open(output_path, 'wb') as pdf_file:
+                pdf_file.write(b"%PDF-1.4\n% " + os.path.basename(docx_path).encode('utf-8') + b"\n%%EOF\n")
+            outputs.append(output_path)
+        return outputs
+
+
+class SofficeConverter(PdfConverter):
+    """One headless LibreOffice run per batch and output folder.
+
+    The user profile is created once and reused, so only the first batch pays
+    for profile initialisation.
+    """
+
+    def __init__(self, soffice_path: str = None):
+        self.soffice_path = soffice_path or PDF_SETTINGS["soffice_path"]
+        self.profile_dir = tempfile.mkdtemp(prefix="contract_generator_lo_")
+
+    def convert(self, docx_paths: List[str]) -> List[str]:
+        by_folder = defaultdict(list)
+        for docx_path in docx_paths:
+            by_folder[os.path.dirname(os.path.abspath(docx_path))].append(docx_path)
+
+        for folder, paths in by_folder.items():
+            result = subprocess.run(
+                [self.soffice_path, f"-env:UserInstallation={Path(self.profile_dir).as_uri()}",
+                 "--headless", "--convert-to", "pdf", "--outdir", folder, *paths],
+                capture_output=True, text=True, timeout=PDF_SETTINGS["convert_timeout"] * len(paths)
+            )
+            if result.returncode != 0:
+                raise ValueError(f"Błąd konwersji do PDF: {result.stderr.strip()}")
+
+        outputs = [pdf_path(docx_path) for docx_path in docx_paths]
+        missing = [output for output in outputs if not os.path.isfile(output)]
+        if missing:
+            raise ValueError(f"Nie utworzono plików PDF: {', '.join(map(os.path.basename, missing))}")
+        return outputs
+
+    def close(self):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class UnoserverConverter(PdfConverter):
+    """Pool of warm unoserver instances, started on first use and kept until close().
+
+    Each instance runs its own LibreOffice with a separate profile and
+    converts one document at a time; batches are spread over the pool.
+    """
+
+    def __init__(self, pool_size: int = None, base_port: int = None):
+        self.pool_size = max(1, pool_size or PDF_SETTINGS["pool_size"])
+        self.base_port = base_port or PDF_SETTINGS["base_port"]
+        self._processes = []
+        self._profiles = []
+        self._clients = queue.Queue()
+        self._executor = None
+
+    def convert(self, docx_paths: List[str]) -> List[str]:
+        if self._executor is None:
+            self._start()
+        return list(self._executor.map(self._convert_one, docx_paths))
+
+    def _convert_one(self, docx_path: str) -> str:
+        """Convert a document on the first free server."""
+        client = self._clients.get()
+        try:
+            output_path = pdf_path(docx_path)
+            client.convert(inpath=os.path.abspath(docx_path), outpath=os.path.abspath(output_path),
+                           convert_to="pdf")
+            return output_path
+        except Exception as e:
+            raise ValueError(f"Błąd konwersji do PDF {os.path.basename(docx_path)}: {str(e)}") from e
+        finally:
+            self._clients.put(client)
+
+    def _start(self):
+        """Start the servers and wait until each accepts connections."""
+        try:
+            from unoserver.client import UnoClient
+        except ImportError:
+            raise ValueError("Konwersja do PDF wymaga pakietu unoserver")
+
+        try:
+            for index in range(self.pool_size):
+                port = self.base_port + 2 * index
+                profile = tempfile.mkdtemp(prefix="contract_generator_lo_")
+                self._profiles.append(profile)
+                self._processes.append(subprocess.Popen(
+                    [PDF_SETTINGS["unoserver_path"], "--interface", "127.0.0.1", "--port", str(port),
+                     "--uno-port", str(port + 1), "--user-installation", Path(profile).as_uri()],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                ))
+                self._wait_for_port(port)
+                self._clients.put(UnoClient(server="127.0.0.1", port=str(port)))
+        except Exception:
+            self.close()
+            raise
+        self._executor = ThreadPoolExecutor(max_workers=self.pool_size)
+
+    def _wait_for_port(self, port: int):
+        """Block until a server listens on the port or the startup timeout passes."""
+        deadline = time.monotonic() + PDF_SETTINGS["startup_timeout"]
+        while time.monotonic() < deadline:
+            if self._processes[-1].poll() is not None:
+                raise ValueError("Serwer konwersji PDF zakończył działanie przy starcie")
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise ValueError(f"Serwer konwersji PDF nie uruchomił się w ciągu {PDF_SETTINGS['startup_timeout']} s")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        for profile in self._profiles:
+            shutil.rmtree(profile, ignore_errors=True)
+        self._processes, self._profiles = [], []
+        self._clients = queue.Queue()
+
+
+PDF_CONVERTERS = {
+    "unoserver": UnoserverConverter,
+    "soffice": SofficeConverter,
+    "stub": StubConverter,
+}
+
+
+def get_converter(name: str = None) -> PdfConverter:
+    """Create the converter configured in PDF_SETTINGS or the one named."""
+    name = name or PDF_SETTINGS["converter"]
+    try:
+        return PDF_CONVERTERS[name]()
+    except KeyError:
+        raise ValueError(f"Nieznany konwerter PDF: {name}")
+
+
+def convert_all(converter: PdfConverter, docx_paths: List[str], batch_size: int = None) -> List[str]:
+    """Convert documents in batches of at most batch_size files."""
+    batch_size = batch_size or PDF_SETTINGS["batch_size"]
+    outputs = []
+    for start in range(0, len(docx_paths), batch_size):
+        outputs.extend(converter.convert(docx_paths[start:start + batch_size]))
+    return outputs
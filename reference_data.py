@@ -0,0 +1,126 @@
+# reference_data.py
+"""Reference data (gminas, postal codes, localities) loaded from an external JSON file."""
+
+import hashlib
+import json
+import os
+import pickle
+import stat
+import sys
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from location_index import LocationIndex
+from normalization import normalize
+
+# Bump when the structure of ReferenceData changes so that old snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+
+class ReferenceData:
+    """Lookup tables built once from the reference data file."""
+
+    def __init__(self, raw: dict):
+        gminas = raw["gminas"]
+        self.postal_codes: Dict[str, str] = dict(raw["postal_codes"])
+        self.valid_gminas: Dict[str, str] = {code: gmina["name"] for code, gmina in gminas.items()}
+        self.gmina_postal_codes: Dict[str, List[str]] = {
+            code: list(gmina["postal_codes"]) for code, gmina in gminas.items()
+        }
+        self.gmina_locations: Dict[str, List[str]] = {
+            code: list(dict.fromkeys(gmina.get("locations", []))) for code, gmina in gminas.items()
+        }
+        self.main_locations: Dict[str, str] = {
+            code: gmina["main_location"] for code, gmina in gminas.items() if gmina.get("main_location")
+        }
+
+        # Reverse maps
+        self.postal_gminas: Dict[str, List[str]] = defaultdict(list)
+        for code, postal_codes in self.gmina_postal_codes.items():
+            for postal_code in postal_codes:
+                self.postal_gminas[postal_code].append(code)
+        self.postal_gminas = dict(self.postal_gminas)
+
+        self.locality_gminas: Dict[str, List[str]] = defaultdict(list)
+        for code, locations in self.gmina_locations.items():
+            for location in [*locations, self.main_locations.get(code)]:
+                if location and code not in self.locality_gminas[normalize(location)]:
+                    self.locality_gminas[normalize(location)].append(code)
+        self.locality_gminas = dict(self.locality_gminas)
+
+        self.location_index = LocationIndex(self.gmina_locations, self.main_locations)
+
+    def gminas_for_locality(self, locality: str) -> List[str]:
+        """Gminas containing a locality of the given name."""
+        return self.locality_gminas.get(normalize(locality), [])
+
+    def postal_codes_for_locality(self, locality: str) -> List[str]:
+        """Postal codes of the gminas containing a locality."""
+        return [postal_code
+                for code in self.gminas_for_locality(locality)
+                for postal_code in self.gmina_postal_codes.get(code, [])]
+
+
+def find_reference_file(path: str) -> str:
+    """Reference file in the working directory, or the copy bundled with the application."""
+    if os.path.isfile(path):
+        return path
+    bundle_dir = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(bundle_dir, os.path.basename(path))
+
+
+def snapshot_dir() -> Optional[str]:
+    """Per-user directory holding binary snapshots of parsed reference data.
+
+    Snapshots are unpickled, so outside %LOCALAPPDATA% the directory has to
+    belong to the current user and be closed to others; None when it is not.
+    """
+    if os.environ.get("LOCALAPPDATA"):
+        return os.path.join(os.environ["LOCALAPPDATA"], "contract_generator")
+    if not hasattr(os, "getuid"):
+        return None
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "contract_generator")
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        return None
+    return path
+
+
+def load_reference_data(path: str) -> ReferenceData:
+    """Load reference data, reusing the snapshot built for the same file contents."""
+    with open(find_reference_file(path), 'rb') as source_file:
+        source = source_file.read()
+
+    digest = hashlib.sha256(source).hexdigest()[:32]
+    directory = snapshot_dir()
+    snapshot_path = os.path.join(directory, f"reference_v{SNAPSHOT_VERSION}_{digest}.pickle") if directory else None
+    if snapshot_path:
+        try:
+            with open(snapshot_path, 'rb') as snapshot_file:
+                return pickle.load(snapshot_file)
+        except Exception:
+            pass
+
+    try:
+        data = ReferenceData(json.loads(source.decode('utf-8')))
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Nieprawidłowy plik danych referencyjnych {path}: {str(e)}")
+
+    if not snapshot_path:
+        return data
+    try:
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as snapshot_file:
+            pickle.dump(data, snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        # The snapshot only speeds up the next start
+        pass
+    return data
@@ -0,0 +1,482 @@
+# registry.py
+"""Append-only contract registry backed by a journal merged into Excel in batches."""
+
+import atexit
+import csv
+import itertools
+import os
+import posixpath
+import re
+import shutil
+import threading
+import zipfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from config import REGISTRY_SETTINGS
+from instrumentation import count
+from locking import FileLock, LockTimeoutError
+
+REGISTRY_COLUMNS = [
+    'Data umowy',
+    'Numer umowy',
+    'Gmina',
+    'Nazwa/Imię i nazwisko',
+    'NIP',
+    'Kod pocztowy',
+    'Miasto',
+    'Miejscowość',
+    'Ulica',
+    'Numer domu',
+    'Email',
+    'Telefon',
+    'EKO',
+    'Data dodania',
+]
+
+
+def registry_row(contract_data: dict) -> list:
+    """Convert template data into a registry row ordered as REGISTRY_COLUMNS."""
+    return [
+        contract_data['data'],
+        f"{contract_data['nr']}/{contract_data['rok']}/{contract_data['gmina']}",
+        contract_data['gmina'],
+        contract_data['nazwa'],
+        contract_data['nip'],
+        contract_data['kod_pocztowy'],
+        contract_data['miasto'],
+        contract_data['miejscowosc'],
+        contract_data['ulica'],
+        contract_data['numer_domu'],
+        contract_data['email'],
+        contract_data['tel'],
+        contract_data['is_eco'],
+        datetime.now().strftime("%d.%m.%Y %H:%M"),
+    ]
+
+
+def cell_text(value, date_format: str = "%d.%m.%Y") -> str:
+    """Registry cell as the text typed in the form; dates typed in Excel use date_format."""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime(date_format)
+    return str(value).strip()
+
+
+class RegistryBackend(ABC):
+    """Storage the journal is merged into."""
+
+    @abstractmethod
+    def append_rows(self, path: str, rows: List[list]):
+        """Append rows ordered as REGISTRY_COLUMNS to the registry at path."""
+
+    @abstractmethod
+    def write_rows(self, path: str, rows: Iterable[list]):
+        """Replace the registry at path with the given rows."""
+
+    @abstractmethod
+    def iter_rows(self, path: str) -> Iterator[list]:
+        """Yield registry rows without the header."""
+
+
+class OpenpyxlBackend(RegistryBackend):
+    """Excel registry streamed through openpyxl read-only and write-only workbooks.
+
+    Appends splice the new rows into the sheet XML and copy the existing
+    rows as bytes, without parsing them into cells, so a merge costs one
+    decompress and recompress of the file rather than an openpyxl round trip
+    of every past row. Sheets the splice does not recognise are rewritten
+    cell by cell instead. Memory stays bounded regardless of the registry
+    size, and the new file replaces the old one atomically.
+    """
+
+    sheet_title = "Sheet1"
+    # Bytes read from the end of the sheet XML to find its last row
+    tail_size = 1 << 16
+
+    def append_rows(self, path: str, rows: List[list]):
+        if not os.path.exists(path):
+            self.write_rows(path, rows)
+            return
+        if not self._splice_rows(path, rows):
+            self._rewrite_rows(path, rows)
+
+    def _splice_rows(self, path: str, rows: List[list]) -> bool:
+        """Insert rows before the end of the sheet data; False when the sheet layout is not recognised."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with zipfile.ZipFile(path) as source:
+                sheet = _first_sheet(source)
+                if sheet is None:
+                    return False
+                sheet_info = source.getinfo(sheet)
+                with source.open(sheet_info) as sheet_file:
+                    tail_start = max(0, sheet_info.file_size - self.tail_size)
+                    sheet_file.seek(tail_start)
+                    tail = sheet_file.read()
+                end = tail.rfind(_SHEET_DATA_END)
+                start = tail.rfind(b"<row ", 0, end) if end >= 0 else -1
+                last_row = _ROW_NUMBER.match(tail, start) if start >= 0 else None
+                if last_row is None:
+                    return False
+
+                first = int(last_row.group(1)) + 1
+                new_rows = "".join(_row_xml(number, row) for number, row in enumerate(rows, first)).encode("utf-8")
+                split = tail_start + end
+
+                with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as target:
+                    for item in source.infolist():
+                        if item.filename != sheet:
+                            target.writestr(_member_info(item), source.read(item))
+                            continue
+                        with source.open(item) as sheet_file, \
+                                target.open(_member_info(item), 'w', force_zip64=True) as out:
+                            # Keep the dimension Excel may have written in line with the new last row
+                            head = sheet_file.read(min(split, 1 << 20))
+                            out.write(_DIMENSION.sub(rb"\g<1>%d\g<2>" % (first + len(rows) - 1), head, count=1))
+                            remaining = split - len(head)
+                            while remaining > 0:
+                                chunk = sheet_file.read(min(remaining, 1 << 20))
+                                out.write(chunk)
+                                remaining -= len(chunk)
+                            out.write(new_rows)
+                            shutil.copyfileobj(sheet_file, out)
+            # The source is closed here, as Windows cannot replace a file that is still open
+            count("bytes_written", os.path.getsize(tmp_path))
+            os.replace(tmp_path, path)
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _rewrite_rows(self, path: str, rows: List[list]):
+        """Append by copying every existing row through openpyxl into a new workbook."""
+        # Imported here so that openpyxl does not slow down application startup
+        from openpyxl import load_workbook
+
+        in_wb = load_workbook(path, read_only=True)
+        try:
+            existing = in_wb.worksheets[0].iter_rows(values_only=True)
+            # Windows cannot replace a file that is still open, so the source is closed first
+            self._save(path, itertools.chain(existing, rows), before_replace=in_wb.close)
+        finally:
+            in_wb.close()
+
+    def write_rows(self, path: str, rows: Iterable[list]):
+        """Replace the registry at path with a header and the given rows."""
+        self._save(path, itertools.chain([REGISTRY_COLUMNS], rows))
+
+    def _save(self, path: str, rows: Iterable, before_replace: Callable[[], None] = None):
+        """Stream rows into a new workbook and move it over path, calling before_replace just before the move."""
+        from openpyxl import Workbook
+
+        out_wb = Workbook(write_only=True)
+        out_ws = out_wb.create_sheet(self.sheet_title)
+        for row in rows:
+            out_ws.append(row)
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            out_wb.save(tmp_path)
+            count("bytes_written", os.path.getsize(tmp_path))
+            if before_replace is not None:
+                before_replace()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def iter_rows(self, path: str) -> Iterator[list]:
+        from openpyxl import load_workbook
+
+        if not os.path.exists(path):
+            return
+        wb = load_workbook(path, read_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            next(rows, None)
+            for row in rows:
+                if any(value is not None for value in row):
+                    yield list(row)
+        finally:
+            wb.close()
+
+
+_SHEET_DATA_END = b"</sheetData>"
+_ROW_NUMBER = re.compile(rb'<row\b[^>]*?\br="(\d+)"')
+_DIMENSION = re.compile(rb'(<dimension ref="[A-Z]+\d+:[A-Z]+)\d+(")')
+# Control characters XML 1.0 does not allow; openpyxl refuses them as well
+_ILLEGAL_CHARACTERS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def _first_sheet(workbook: zipfile.ZipFile) -> Optional[str]:
+    """Zip member holding the first worksheet of an xlsx file, or None if it cannot be found."""
+    try:
+        root = ElementTree.fromstring(workbook.read("xl/workbook.xml"))
+        sheet = next(element for element in root.iter() if element.tag.endswith("}sheet"))
+        relation_id = sheet.get(f"{{{_RELATIONSHIPS_NS}}}id")
+        relations = ElementTree.fromstring(workbook.read("xl/_rels/workbook.xml.rels"))
+        target = next(element.get("Target") for element in relations
+                      if element.get("Id") == relation_id)
+    except (KeyError, StopIteration, ElementTree.ParseError):
+        return None
+    # Targets are relative to xl/ unless they start at the package root
+    name = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    return name if name in workbook.namelist() else None
+
+
+def _member_info(item: zipfile.ZipInfo) -> zipfile.ZipInfo:
+    """Fresh entry for copying a zip member into another archive."""
+    info = zipfile.ZipInfo(item.filename, item.date_time)
+    info.compress_type = item.compress_type
+    info.external_attr = item.external_attr
+    return info
+
+
+def _row_xml(number: int, row: list) -> str:
+    """Sheet XML of a registry row; text is stored inline so the shared strings stay untouched."""
+    from openpyxl.utils import get_column_letter
+
+    cells = []
+    for column, value in enumerate(row, 1):
+        # Empty cells are left out, as openpyxl does
+        if value is None or value == "":
+            continue
+        reference = f"{get_column_letter(column)}{number}"
+        if isinstance(value, bool):
+            cells.append(f'<c r="{reference}" t="b"><v>{int(value)}</v></c>')
+        elif isinstance(value, (int, float)):
+            cells.append(f'<c r="{reference}"><v>{value!r}</v></c>')
+        else:
+            text = escape(_ILLEGAL_CHARACTERS.sub("", str(value)))
+            space = ' xml:space="preserve"' if text != text.strip() else ""
+            cells.append(f'<c r="{reference}" t="inlineStr"><is><t{space}>{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'
+
+
+REGISTRY_BACKENDS = {
+    "openpyxl": OpenpyxlBackend,
+}
+
+
+def get_backend(name: str = None) -> RegistryBackend:
+    """Create the registry backend configured in REGISTRY_SETTINGS."""
+    name = name or REGISTRY_SETTINGS["backend"]
+    try:
+        return REGISTRY_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Nieznany rodzaj rejestru: {name}")
+
+
+class BackgroundFlusher:
+    """Daemon thread running registry merges off the generation path.
+
+    Requests made while a merge is running are coalesced into the next one,
+    and a merge skipped because another workstation held the lock is retried
+    after ``retry_interval`` seconds.
+    """
+
+    def __init__(self, flush: Callable[[], int], retry_interval: float = None):
+        self._flush = flush
+        self.retry_interval = retry_interval or REGISTRY_SETTINGS["flush_retry_interval"]
+        self.last_error: Optional[Exception] = None
+        self._requested = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def request(self):
+        """Ask for a merge as soon as the thread is free."""
+        self._requested.set()
+
+    def stop(self, timeout: float = None):
+        """Let a running merge finish and end the thread."""
+        self._stopping.set()
+        self._requested.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        retry = False
+        while True:
+            requested = self._requested.wait(self.retry_interval if retry else None)
+            if self._stopping.is_set():
+                return
+            if not (requested or retry):
+                continue
+            self._requested.clear()
+            try:
+                self._flush()
+                retry = False
+                self.last_error = None
+            except LockTimeoutError:
+                # Another workstation is merging; its merge may not include our rows
+                retry = True
+            except Exception as e:
+                # Rows stay in the journal and are merged by the next flush
+                self.last_error = e
+                retry = True
+
+
+_flushers: Dict[str, BackgroundFlusher] = {}
+_flushers_lock = threading.Lock()
+
+
+def background_flusher(key: str, flush: Callable[[], int]) -> BackgroundFlusher:
+    """Flusher thread for a registry, started on first use."""
+    with _flushers_lock:
+        flusher = _flushers.get(key)
+        if flusher is None:
+            flusher = _flushers[key] = BackgroundFlusher(flush)
+        return flusher
+
+
+def stop_background_flusher(key: str):
+    """Wait for the merge running in the flusher thread of a registry, if any, and end the thread.
+
+    An explicit flush calls this first, so it never waits on the registry
+    lock held by a long merge of its own process.
+    """
+    with _flushers_lock:
+        flusher = _flushers.pop(key, None)
+    if flusher is not None:
+        flusher.stop()
+
+
+if hasattr(os, "register_at_fork"):
+    # Flusher threads do not survive fork; children start their own
+    os.register_at_fork(after_in_child=_flushers.clear)
+
+
+@atexit.register
+def stop_background_flushers():
+    """Wait for running merges so the process never exits half-way through one."""
+    with _flushers_lock:
+        flushers = list(_flushers.values())
+        _flushers.clear()
+    for flusher in flushers:
+        flusher.stop()
+
+
+class RegistryWriter:
+    """Appends registry rows to a CSV journal and merges them into the Excel file in batches.
+
+    Appends hold only the short journal lock and are fsync'd, so a contract
+    is durable in the journal as soon as append returns. A flush moves the
+    journal aside under that lock and merges it while holding a separate
+    Excel lock, so other workstations can keep appending during the rewrite.
+    A flushing file left by a crash is merged again by the next flush,
+    skipping rows that already reached the Excel file.
+    """
+
+    def __init__(self, excel_path: str, flush_every: int = None, backend: RegistryBackend = None,
+                 background: bool = None):
+        self.excel_path = excel_path
+        self.backend = backend or get_backend()
+        self.journal_path = excel_path + REGISTRY_SETTINGS["journal_suffix"]
+        self.flushing_path = self.journal_path + ".flushing"
+        self.flush_every = flush_every or REGISTRY_SETTINGS["flush_every"]
+        self.background = REGISTRY_SETTINGS["background_flush"] if background is None else background
+
+    def append(self, rows: Iterable[list]) -> int:
+        """Append rows to the journal and flush once enough of them are pending.
+
+        In background mode the merge is handed to a flusher thread and 0 is
+        returned; otherwise the number of merged rows is returned.
+        """
+        with self._journal_lock():
+            with open(self.journal_path, 'a', newline='', encoding='utf-8') as journal:
+                if not self._ends_with_newline(self.journal_path):
+                    # Terminate a row torn by a crash so it does not swallow the new one
+                    journal.write("\r\n")
+                csv.writer(journal).writerows(rows)
+                journal.flush()
+                os.fsync(journal.fileno())
+            pending = len(self._read(self.journal_path))
+
+        if pending >= self.flush_every:
+            if self.background:
+                background_flusher(os.path.abspath(self.excel_path), lambda: self.flush(timeout=0)).request()
+                return 0
+            try:
+                return self.flush(timeout=0)
+            except LockTimeoutError:
+                # Another workstation is already merging the registry
+                pass
+        return 0
+
+    def recover(self) -> int:
+        """Finish a flush interrupted by a crash; returns the number of rows merged."""
+        if not os.path.exists(self.flushing_path):
+            return 0
+        return self.flush()
+
+    def pending_rows(self) -> List[list]:
+        """Rows written to the journal but not yet merged into the Excel file."""
+        return self._read(self.flushing_path) + self._read(self.journal_path)
+
+    def pending_count(self) -> int:
+        """Number of journal rows waiting for the next flush."""
+        return len(self.pending_rows())
+
+    def flush(self, timeout: float = None) -> int:
+        """Merge pending journal rows into the Excel file in a single rewrite."""
+        with FileLock(self.excel_path + ".lock", timeout=timeout,
+                      stale_after=REGISTRY_SETTINGS["flush_stale_after"]):
+            interrupted = os.path.exists(self.flushing_path)
+            with self._journal_lock():
+                self._move_journal_aside()
+
+            rows = self._read(self.flushing_path)
+            if rows and interrupted:
+                # The crashed flush may have replaced the Excel file before removing its journal
+                merged = {str(row[1]) for row in self.backend.iter_rows(self.excel_path)}
+                rows = [row for row in rows if row[1] not in merged]
+
+            if rows:
+                self.backend.append_rows(self.excel_path, rows)
+            if os.path.exists(self.flushing_path):
+                os.remove(self.flushing_path)
+            count("registry_rows_merged", len(rows))
+            return len(rows)
+
+    def _move_journal_aside(self):
+        """Move journal rows to the flushing file, keeping rows left by an interrupted flush."""
+        if not os.path.exists(self.journal_path):
+            return
+        if not os.path.exists(self.flushing_path):
+            os.replace(self.journal_path, self.flushing_path)
+            return
+
+        rows = self._read(self.journal_path)
+        with open(self.flushing_path, 'a', newline='', encoding='utf-8') as flushing:
+            csv.writer(flushing).writerows(rows)
+            flushing.flush()
+            os.fsync(flushing.fileno())
+        os.remove(self.journal_path)
+
+    def _journal_lock(self) -> FileLock:
+        """Short lock guarding the journal file."""
+        return FileLock(self.journal_path + ".lock")
+
+    @staticmethod
+    def _ends_with_newline(path: str) -> bool:
+        """True for an empty file or one whose last row is complete."""
+        with open(path, 'rb') as journal:
+            journal.seek(0, os.SEEK_END)
+            if journal.tell() == 0:
+                return True
+            journal.seek(-1, os.SEEK_END)
+            return journal.read(1) == b"\n"
+
+    @staticmethod
+    def _read(path: str) -> List[list]:
+        """Read journal rows from a CSV file, skipping a row torn by a crash during append."""
+        if not os.path.exists(path):
+            return []
+        with open(path, newline='', encoding='utf-8') as journal:
+            return [row for row in csv.reader(journal) if len(row) == len(REGISTRY_COLUMNS)]
@@ -0,0 +1,132 @@
+# registry_archive.py
+"""Read-only, gzip-compressed per-year segments of the contract registry."""
+
+import csv
+import gzip
+import io
+import os
+import stat
+from typing import Dict, Iterator, List, Optional
+
+from config import REGISTRY_SETTINGS
+from locking import FileLock
+from registry import REGISTRY_COLUMNS, RegistryBackend, get_backend
+
+
+def contract_year(row: list) -> Optional[str]:
+    """Year part of the 'nr/rok/gmina' contract number of a registry row."""
+    parts = str(row[1] or "").split('/')
+    return parts[1] if len(parts) == 3 and parts[1].isdigit() else None
+
+
+def archive_path(excel_path: str, year: str) -> str:
+    """Archive segment holding the contracts of a year."""
+    return os.path.splitext(excel_path)[0] + REGISTRY_SETTINGS["archive_suffix"].format(year=year)
+
+
+def archive_years(excel_path: str) -> List[str]:
+    """Years that have an archive segment next to the registry, oldest first."""
+    folder = os.path.dirname(excel_path) or "."
+    before, suffix = REGISTRY_SETTINGS["archive_suffix"].split("{year}")
+    prefix = os.path.splitext(os.path.basename(excel_path))[0] + before
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return []
+    years = (name[len(prefix):-len(suffix)] for name in names
+             if name.startswith(prefix) and name.endswith(suffix))
+    return sorted(year for year in years if year.isdigit())
+
+
+def iter_archive(path: str) -> Iterator[list]:
+    """Yield the rows of an archive segment without the header."""
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as archive:
+        rows = csv.reader(archive)
+        next(rows, None)
+        yield from rows
+
+
+def iter_archives(excel_path: str, year: str = None) -> Iterator[list]:
+    """Yield the rows of every archive segment, oldest year first, or only of one year."""
+    for archived_year in archive_years(excel_path):
+        if year is None or archived_year == year:
+            yield from iter_archive(archive_path(excel_path, archived_year))
+
+
+class _ArchiveWriter:
+    """New version of an archive segment written next to it and swapped in on commit."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.numbers = set()
+        self._raw = open(self.tmp_path, 'wb')
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        self._text = io.TextIOWrapper(self._gzip, encoding='utf-8', newline='')
+        self._csv = csv.writer(self._text)
+        self._csv.writerow(REGISTRY_COLUMNS)
+        if os.path.exists(path):
+            for row in iter_archive(path):
+                self.write(row)
+        self.existing = len(self.numbers)
+
+    def write(self, row: list):
+        """Add a row unless its contract number is already archived."""
+        number = str(row[1])
+        if number in self.numbers:
+            return
+        self.numbers.add(number)
+        self._csv.writerow(["" if value is None else value for value in row])
+
+    def commit(self) -> int:
+        """Replace the archive with the new version; returns the number of rows added."""
+        self._text.flush()
+        self._gzip.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+        if os.path.exists(self.path):
+            # Windows refuses to replace a read-only file
+            os.chmod(self.path, stat.S_IREAD | stat.S_IWRITE)
+        os.replace(self.tmp_path, self.path)
+        os.chmod(self.path, stat.S_IREAD)
+        return len(self.numbers) - self.existing
+
+    def discard(self):
+        """Remove the unfinished new version."""
+        self._raw.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def rollover(excel_path: str, before_year: str, backend: RegistryBackend = None) -> Dict[str, int]:
+    """Move registry rows of years before ``before_year`` into their archive segments.
+
+    Archives are committed before the Excel file is rewritten, and rows
+    already present in an archive are skipped, so an interrupted rollover is
+    completed by running it again. Returns the number of rows archived per
+    year.
+    """
+    backend = backend or get_backend()
+    with FileLock(excel_path + ".lock", stale_after=REGISTRY_SETTINGS["flush_stale_after"]):
+        writers: Dict[str, _ArchiveWriter] = {}
+        try:
+            for row in backend.iter_rows(excel_path):
+                year = contract_year(row)
+                if year is None or year >= before_year:
+                    continue
+                if year not in writers:
+                    writers[year] = _ArchiveWriter(archive_path(excel_path, year))
+                writers[year].write(row)
+            archived = {year: writer.commit() for year, writer in sorted(writers.items())}
+        except BaseException:
+            for writer in writers.values():
+                writer.discard()
+            raise
+
+        if writers:
+            backend.write_rows(excel_path, (
+                row for row in backend.iter_rows(excel_path)
+                if (year := contract_year(row)) is None or year >= before_year
+            ))
+        return archived
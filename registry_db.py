@@ -0,0 +1,238 @@
+# registry_db.py
+"""SQLite contract registry with the Excel sheet exported from it on demand."""
+
+import os
+import sqlite3
+from typing import Iterable, Iterator
+
+from config import REGISTRY_SETTINGS
+from locking import FileLock
+from registry import REGISTRY_COLUMNS, OpenpyxlBackend, cell_text
+
+# Database columns in REGISTRY_COLUMNS order; 'Numer umowy' is stored split into nr/rok/gmina
+_ROW_COLUMNS = (
+    "data_umowy", "gmina", "nazwa", "nip", "kod_pocztowy", "miasto", "miejscowosc",
+    "ulica", "numer_domu", "email", "tel", "is_eco", "data_dodania",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    id INTEGER PRIMARY KEY,
+    nr INTEGER NOT NULL,
+    rok TEXT NOT NULL,
+    gmina TEXT NOT NULL,
+    data_umowy TEXT,
+    nazwa TEXT,
+    nip TEXT,
+    kod_pocztowy TEXT,
+    miasto TEXT,
+    miejscowosc TEXT,
+    ulica TEXT,
+    numer_domu TEXT,
+    email TEXT,
+    tel TEXT,
+    is_eco TEXT,
+    data_dodania TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS contracts_number ON contracts (rok, gmina, nr);
+CREATE INDEX IF NOT EXISTS contracts_nazwa ON contracts (nazwa);
+CREATE INDEX IF NOT EXISTS contracts_nip ON contracts (nip);
+CREATE TABLE IF NOT EXISTS counters (
+    rok TEXT NOT NULL,
+    gmina TEXT NOT NULL,
+    nr INTEGER NOT NULL,
+    PRIMARY KEY (rok, gmina)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def split_contract_number(value) -> tuple:
+    """Split a 'nr/rok/gmina' registry value into its parts."""
+    number, year, gmina = str(value).split('/', 2)
+    return int(number), year, gmina
+
+
+class SqliteRegistry:
+    """Registry rows stored in SQLite, indexed by number, name and NIP.
+
+    WAL mode needs shared memory and does not work on network shares; set
+    REGISTRY_SETTINGS["sqlite_journal_mode"] to "delete" when the database
+    lives on SMB.
+    """
+
+    def __init__(self, db_path: str, journal_mode: str = None):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path, timeout=REGISTRY_SETTINGS["sqlite_timeout"],
+                                          isolation_level=None)
+        self.connection.execute(
+            f"PRAGMA journal_mode={journal_mode or REGISTRY_SETTINGS['sqlite_journal_mode']}")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_rows(self, rows: Iterable[list]):
+        """Insert registry rows ordered as REGISTRY_COLUMNS."""
+        records = []
+        for row in rows:
+            number, year, gmina = split_contract_number(row[1])
+            values = [row[0]] + list(row[2:])
+            records.append((number, year, *values))
+
+        placeholders = ", ".join("?" * (len(_ROW_COLUMNS) + 2))
+        with self._transaction():
+            self.connection.executemany(
+                f"INSERT INTO contracts (nr, rok, {', '.join(_ROW_COLUMNS)}) VALUES ({placeholders})",
+                records
+            )
+
+    def reserve_number(self, gmina: str, year: str, count: int = 1) -> int:
+        """Allocate consecutive contract numbers in one transaction and return the first."""
+        with self._transaction():
+            number = self._last_number(gmina, year) + 1
+            self.connection.execute(
+                "INSERT OR REPLACE INTO counters (rok, gmina, nr) VALUES (?, ?, ?)",
+                (year, gmina, number + count - 1)
+            )
+        return number
+
+    def release_number(self, gmina: str, year: str, number: int, count: int = 1):
+        """Give back reserved numbers if no later number was allocated meanwhile."""
+        with self._transaction():
+            self.connection.execute(
+                "UPDATE counters SET nr = ? WHERE rok = ? AND gmina = ? AND nr = ?",
+                (number - 1, year, gmina, number + count - 1)
+            )
+
+    def iter_rows(self, after_id: int = 0, year: str = None, gmina: str = None,
+                  is_eco: str = None, before_id: int = None) -> Iterator[list]:
+        """Yield registry rows ordered as REGISTRY_COLUMNS, optionally only of a year, gmina or EKO value.
+
+        ``after_id`` and ``before_id`` limit the row ids, the latter inclusively.
+        """
+        conditions, params = ["id > ?"], [after_id]
+        for condition, value in (("id <=", before_id), ("rok =", year), ("gmina =", gmina), ("is_eco =", is_eco)):
+            if value is not None:
+                conditions.append(f"{condition} ?")
+                params.append(value)
+        cursor = self.connection.execute(
+            f"SELECT nr, rok, {', '.join(_ROW_COLUMNS)} FROM contracts "
+            f"WHERE {' AND '.join(conditions)} ORDER BY id",
+            params
+        )
+        for number, year, date, gmina, *rest in cursor:
+            yield [date, f"{number}/{year}/{gmina}", gmina, *rest]
+
+    def pending_export_count(self) -> int:
+        """Number of rows not yet exported to the Excel file."""
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM contracts WHERE id > ?", (self._exported_id(),)
+        ).fetchone()[0]
+
+    def export_xlsx(self, excel_path: str, full: bool = False, timeout: float = None,
+                    skip_years: Iterable[str] = ()) -> int:
+        """Append rows added since the last export to the Excel file, or rewrite it when full.
+
+        A full export leaves out the rows of ``skip_years``, e.g. years moved to archive segments.
+        """
+        with FileLock(excel_path + ".lock", timeout=timeout,
+                      stale_after=REGISTRY_SETTINGS["flush_stale_after"]):
+            last_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) FROM contracts").fetchone()[0]
+            if full or not os.path.exists(excel_path):
+                skip_years = set(skip_years)
+                OpenpyxlBackend().write_rows(excel_path, (
+                    row for row in self.iter_rows(before_id=last_id)
+                    if row[1].split('/')[1] not in skip_years
+                ))
+                exported = last_id
+            else:
+                # Rows inserted after last_id was read are left for the next export
+                rows = list(self.iter_rows(self._exported_id(), before_id=last_id))
+                if rows:
+                    OpenpyxlBackend().append_rows(excel_path, rows)
+                exported = len(rows)
+
+            with self._transaction():
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('exported_id', ?)", (str(last_id),))
+        return exported
+
+    def import_xlsx(self, excel_path: str) -> int:
+        """Load rows from an existing Excel registry, skipping numbers already present.
+
+        When no database row is waiting for export, the imported rows are
+        marked as exported, since they are already in the Excel file.
+        """
+        records = []
+        for row in OpenpyxlBackend().iter_rows(excel_path):
+            row = list(row) + [None] * (len(REGISTRY_COLUMNS) - len(row))
+            try:
+                number, year, gmina = split_contract_number(row[1])
+            except ValueError:
+                continue
+            # Dates typed in Excel are stored as the form would have written them
+            values = [cell_text(value) for value in [row[0]] + row[2:len(REGISTRY_COLUMNS) - 1]]
+            values.append(cell_text(row[len(REGISTRY_COLUMNS) - 1], "%d.%m.%Y %H:%M"))
+            values[1] = gmina
+            records.append((number, year, *values))
+
+        placeholders = ", ".join("?" * (len(_ROW_COLUMNS) + 2))
+        with self._transaction():
+            up_to_date = self.connection.execute(
+                "SELECT COUNT(*) FROM contracts WHERE id > ?", (self._exported_id(),)).fetchone()[0] == 0
+            before = self.connection.total_changes
+            self.connection.executemany(
+                f"INSERT OR IGNORE INTO contracts (nr, rok, {', '.join(_ROW_COLUMNS)}) VALUES ({placeholders})",
+                records
+            )
+            imported = self.connection.total_changes - before
+            if up_to_date:
+                # Imported rows already exist in the Excel file
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) "
+                    "VALUES ('exported_id', (SELECT COALESCE(MAX(id), 0) FROM contracts))")
+        return imported
+
+    def _last_number(self, gmina: str, year: str) -> int:
+        """Highest number reserved or stored for the year and gmina."""
+        row = self.connection.execute(
+            "SELECT MAX(nr) FROM (SELECT nr FROM counters WHERE rok = ? AND gmina = ? "
+            "UNION ALL SELECT MAX(nr) FROM contracts WHERE rok = ? AND gmina = ?)",
+            (year, gmina, year, gmina)
+        ).fetchone()
+        return row[0] or 0
+
+    def _exported_id(self) -> int:
+        """Id of the last row written to the Excel file."""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'exported_id'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _transaction(self) -> "_Transaction":
+        """Write transaction taking the database lock up front."""
+        return _Transaction(self.connection)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
@@ -0,0 +1,101 @@
+# registry_query.py
+"""Filtered, streaming reads and exports of the contract registry."""
+
+import csv
+import os
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Iterable, Iterator, Optional
+
+from registry import REGISTRY_COLUMNS, OpenpyxlBackend
+
+_DATE = REGISTRY_COLUMNS.index('Data umowy')
+_GMINA = REGISTRY_COLUMNS.index('Gmina')
+_ECO = REGISTRY_COLUMNS.index('EKO')
+
+EXPORT_FORMATS = (".csv", ".xlsx")
+
+
+def contract_date(value) -> Optional[date]:
+    """Contract date of a registry cell: a dd.mm.yyyy text or a date typed in Excel."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+@dataclass
+class RegistryQuery:
+    """Conditions a registry row has to meet; None matches everything.
+
+    ``year`` refers to the year in the contract number, ``date_from`` and
+    ``date_to`` to the contract date, both ends included.
+    """
+    year: Optional[str] = None
+    gmina: Optional[str] = None
+    is_eco: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+    def matches(self, row: list) -> bool:
+        """True when the registry row meets every condition."""
+        if self.gmina is not None and row[_GMINA] != self.gmina:
+            return False
+        if self.is_eco is not None and str(row[_ECO] or "").strip().lower() != self.is_eco:
+            return False
+        if self.year is not None:
+            parts = str(row[1] or "").split('/')
+            if len(parts) != 3 or parts[1] != self.year:
+                return False
+        if self.date_from is not None or self.date_to is not None:
+            signed = contract_date(row[_DATE])
+            if signed is None:
+                return False
+            if self.date_from is not None and signed < self.date_from:
+                return False
+            if self.date_to is not None and signed > self.date_to:
+                return False
+        return True
+
+    def filter(self, rows: Iterable[list]) -> Iterator[list]:
+        """Yield the matching rows as they are read."""
+        return (row for row in rows if self.matches(row))
+
+
+def export_rows(rows: Iterable[list], path: str) -> int:
+    """Stream rows into a CSV or Excel file chosen by the extension; returns the row count.
+
+    The file is written under a temporary name and renamed when complete.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Nieobsługiwany format eksportu: {extension or path}")
+
+    exported = 0
+
+    def counted(source: Iterable[list]) -> Iterator[list]:
+        nonlocal exported
+        for row in source:
+            exported += 1
+            yield row
+
+    if extension == ".xlsx":
+        OpenpyxlBackend().write_rows(path, counted(rows))
+        return exported
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        # utf-8-sig so that Excel opens Polish characters correctly
+        with open(tmp_path, 'w', newline='', encoding='utf-8-sig') as export_file:
+            writer = csv.writer(export_file, delimiter=';')
+            writer.writerow(REGISTRY_COLUMNS)
+            writer.writerows(["" if value is None else value for value in row] for row in counted(rows))
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return exported
@@ -0,0 +1,113 @@
+# search_index.py
+"""In-memory customer index over registry rows for search and duplicate detection."""
+
+from collections import defaultdict
+from typing import Iterable, List, Set
+
+from contract_data import ContractData
+from normalization import normalize, normalize_nip
+from registry import REGISTRY_COLUMNS
+
+_NUMBER = REGISTRY_COLUMNS.index('Numer umowy')
+_NAME = REGISTRY_COLUMNS.index('Nazwa/Imię i nazwisko')
+_NIP = REGISTRY_COLUMNS.index('NIP')
+_POSTAL = REGISTRY_COLUMNS.index('Kod pocztowy')
+_CITY = REGISTRY_COLUMNS.index('Miasto')
+_LOCATION = REGISTRY_COLUMNS.index('Miejscowość')
+_STREET = REGISTRY_COLUMNS.index('Ulica')
+_HOUSE = REGISTRY_COLUMNS.index('Numer domu')
+
+
+def address_key(postal_code, city, location, street, house_number) -> str:
+    """Normalized address used for exact duplicate lookups."""
+    street = "" if str(street or "").strip() == "-" else street
+    return normalize(f"{postal_code} {location or city} {street} {house_number}")
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Character trigrams of normalized text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class CustomerIndex:
+    """Trigram index on names plus exact indexes on name, NIP and address.
+
+    Rows are added one by one as contracts are issued, so the index never has
+    to be rebuilt from the registry after the initial load. Posting lists are
+    kept in insertion order, which lets searches walk them newest first and
+    stop as soon as enough matches are found.
+    """
+
+    def __init__(self, rows: Iterable[list] = ()):
+        self.rows: List[list] = []
+        self._names: List[str] = []
+        self._numbers: Set[str] = set()
+        self._trigram_index = defaultdict(list)
+        self._prefix_index = defaultdict(list)
+        self._name_index = defaultdict(list)
+        self._nip_index = defaultdict(list)
+        self._address_index = defaultdict(list)
+        for row in rows:
+            self.add(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, row: list):
+        """Index a registry row ordered as REGISTRY_COLUMNS; repeated contract numbers are skipped."""
+        number = str(row[_NUMBER])
+        if number in self._numbers:
+            return
+        self._numbers.add(number)
+
+        position = len(self.rows)
+        name = normalize(row[_NAME])
+        self.rows.append(row)
+        self._names.append(name)
+
+        for trigram in _trigrams(name):
+            self._trigram_index[trigram].append(position)
+        for prefix in {word[:length] for word in name.split() for length in (1, 2)}:
+            self._prefix_index[prefix].append(position)
+        self._name_index[name].append(position)
+
+        nip = normalize_nip(row[_NIP])
+        if nip:
+            self._nip_index[nip].append(position)
+        self._address_index[address_key(row[_POSTAL], row[_CITY], row[_LOCATION],
+                                         row[_STREET], row[_HOUSE])].append(position)
+
+    def search(self, query: str, limit: int = 20) -> List[list]:
+        """Rows whose name contains the query or whose NIP equals it, newest first."""
+        text = normalize(query)
+        if not text:
+            return []
+
+        nip = normalize_nip(query)
+        matches = list(self._nip_index.get(nip, ())) if nip else []
+
+        if len(text) < 3:
+            candidates = self._prefix_index.get(text, [])
+        else:
+            postings = [self._trigram_index.get(trigram, []) for trigram in _trigrams(text)]
+            candidates = min(postings, key=len)
+
+        for position in reversed(candidates):
+            if len(matches) >= limit:
+                break
+            if text in self._names[position] and position not in matches:
+                matches.append(position)
+
+        return [self.rows[position] for position in sorted(matches, reverse=True)[:limit]]
+
+    def find_duplicates(self, contract_data: ContractData) -> List[list]:
+        """Rows with the same NIP, the same address or the same name as the new contract."""
+        positions = set(self._name_index.get(normalize(contract_data.name), ()))
+        nip = normalize_nip(contract_data.nip)
+        if nip:
+            positions.update(self._nip_index.get(nip, ()))
+        positions.update(self._address_index.get(address_key(
+            contract_data.postal_code, contract_data.city, contract_data.location,
+            contract_data.street, contract_data.house_number), ()))
+
+        return [self.rows[position] for position in sorted(positions)]
@@ -0,0 +1,231 @@
+# service.py
+"""Local HTTP/JSON generation service keeping the template, reference data and registry warm."""
+
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+from config import GMINA_POSTAL_CODES, INSTRUMENTATION_SETTINGS, SERVICE_SETTINGS
+from contract_data import ContractData, ContractManager
+from generation import ContractNotRegisteredError, ContractSavedError, ContractWriter
+from instrumentation import PipelineMetrics
+from registry import REGISTRY_COLUMNS, registry_row
+from search_index import CustomerIndex
+from validators import ContractValidator
+
+
+class DuplicateContractError(ValueError):
+    """The customer may already have a contract; resend with force to generate anyway."""
+
+    def __init__(self, message: str, rows: List[list]):
+        super().__init__(message)
+        self.rows = rows
+
+
+class ContractService:
+    """Generation requests from all clients go through one warm ContractWriter.
+
+    Generation is serialized with a lock, so numbers are handed out in
+    request order without contention on the shared folder. Searches run
+    concurrently against the in-memory customer index.
+    """
+
+    def __init__(self, paths: dict, host: str = None, port: int = None):
+        self.paths = paths
+        self.writer = ContractWriter(metrics=PipelineMetrics(log_file=INSTRUMENTATION_SETTINGS["log_file"] or None))
+        ContractManager.recover_registry(paths["excel_file"])
+        self.customer_index = CustomerIndex(ContractManager.iter_registry(paths["excel_file"]))
+        self._generate_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host or SERVICE_SETTINGS["host"],
+                                           SERVICE_SETTINGS["port"] if port is None else port),
+                                          _ServiceHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL the service listens on."""
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm_up(self):
+        """Load the template before the first request."""
+        self.writer.template_cache.get(self.paths["template"])
+
+    def serve_forever(self):
+        """Handle requests until shutdown() is called."""
+        self.server.serve_forever()
+
+    def start(self) -> "ContractService":
+        """Handle requests on a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        """Stop serving, merge pending registry rows and stop the PDF converter."""
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server.server_close()
+        with self._generate_lock:
+            ContractManager.flush_registry(self.paths["excel_file"])
+            self.writer.close()
+
+    def generate(self, values: dict, force: bool = False, contract_number: int = None, year: str = None) -> dict:
+        """Validate and write a contract; raises DuplicateContractError unless forced.
+
+        ``contract_number`` and ``year`` retry a contract that was saved but not registered.
+        """
+        contract_data = ContractData.from_dict(values)
+        ContractValidator.validate_required_fields(contract_data)
+        ContractValidator.validate_postal_code(contract_data.gmina, contract_data.postal_code, GMINA_POSTAL_CODES)
+
+        if not force:
+            duplicates = self.find_duplicates(values)
+            if duplicates:
+                raise DuplicateContractError("Ten klient może już mieć umowę", duplicates)
+
+        warning = None
+        with self._generate_lock:
+            try:
+                filename, template_data = self.writer.write(contract_data, self.paths, year, contract_number)
+                row = registry_row(template_data)
+            except ContractSavedError as e:
+                filename, row, warning = e.filename, e.row, str(e)
+        with self._index_lock:
+            self.customer_index.add(row)
+        result = {"filename": filename, "number": row[1], "row": row}
+        if warning:
+            result["warning"] = warning
+        return result
+
+    def search(self, query: str, limit: int = 20) -> List[list]:
+        """Search the customer index."""
+        with self._index_lock:
+            return self.customer_index.search(query, limit)
+
+    def find_duplicates(self, values: dict) -> List[list]:
+        """Registry rows that look like the same customer."""
+        with self._index_lock:
+            return self.customer_index.find_duplicates(ContractData.from_dict(values))
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    """Routes JSON requests to the ContractService of the server."""
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        service = self.server.service
+        if url.path == "/health":
+            self._reply(200, {"status": "ok", "contracts": len(service.customer_index)})
+        elif url.path == "/customers":
+            limit = int(query.get("limit", ["20"])[0])
+            rows = service.search(query.get("q", [""])[0], limit)
+            self._reply(200, {"columns": REGISTRY_COLUMNS, "rows": rows})
+        else:
+            self._reply(404, {"error": "Nieznany adres"})
+
+    def do_POST(self):
+        service = self.server.service
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+            values = body["contract"]
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {"error": "Nieprawidłowe zapytanie"})
+            return
+
+        try:
+            if self.path == "/contracts":
+                self._reply(201, service.generate(values, force=bool(body.get("force")),
+                                                  contract_number=body.get("number"), year=body.get("year")))
+            elif self.path == "/duplicates":
+                self._reply(200, {"columns": REGISTRY_COLUMNS, "rows": service.find_duplicates(values)})
+            else:
+                self._reply(404, {"error": "Nieznany adres"})
+        except DuplicateContractError as e:
+            self._reply(409, {"error": str(e), "columns": REGISTRY_COLUMNS, "rows": e.rows})
+        except ContractNotRegisteredError as e:
+            self._reply(500, {"error": str(e), "number": e.contract_number, "year": e.year})
+        except KeyError as e:
+            self._reply(400, {"error": f"Brak pola {e}"})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+
+    def _reply(self, status: int, payload: dict):
+        """Send a JSON response."""
+        data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Requests are timed by the instrumentation log instead
+        pass
+
+
+class ServiceClient:
+    """Thin client used by the GUI when SERVICE_SETTINGS["url"] is set."""
+
+    def __init__(self, base_url: str, timeout: float = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout or SERVICE_SETTINGS["timeout"]
+
+    def health(self) -> dict:
+        """Service status."""
+        return self._request("GET", "/health")
+
+    def generate(self, contract_data: ContractData, force: bool = False, contract_number: int = None,
+                 year: str = None) -> dict:
+        """Generate a contract; raises DuplicateContractError unless forced.
+
+        Raises ContractSavedError when the contract was issued but a later step failed.
+        """
+        result = self._request("POST", "/contracts", {"contract": contract_data.to_values(), "force": force,
+                                                      "number": contract_number, "year": year})
+        if result.get("warning"):
+            raise ContractSavedError(result["warning"], result["filename"], result["row"])
+        return result
+
+    def search(self, query: str, limit: int = 20) -> List[list]:
+        """Registry rows matching the query."""
+        params = urllib.parse.urlencode({"q": query, "limit": limit})
+        return self._request("GET", f"/customers?{params}")["rows"]
+
+    def find_duplicates(self, contract_data: ContractData) -> List[list]:
+        """Registry rows that look like the same customer."""
+        return self._request("POST", "/duplicates", {"contract": contract_data.to_values()})["rows"]
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        """Send a request and decode the JSON reply, raising ValueError on errors."""
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            try:
+                body = json.loads(e.read().decode("utf-8"))
+            except ValueError:
+                body = {"error": str(e)}
+            if e.code == 409:
+                raise DuplicateContractError(body["error"], body.get("rows", []))
+            if body.get("number") is not None:
+                raise ContractNotRegisteredError(body["error"], body["number"], body["year"])
+            raise ValueError(body.get("error", str(e)))
+        except urllib.error.URLError as e:
+            raise ValueError(f"Brak połączenia z usługą generowania umów: {e.reason}")
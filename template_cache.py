@@ -0,0 +1,103 @@
+# template_cache.py
+"""In-memory cache of parsed and compiled contract templates."""
+
+import functools
+import hashlib
+import io
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Tuple
+
+if TYPE_CHECKING:
+    from docxtpl import DocxTemplate
+
+
+@functools.lru_cache(maxsize=None)
+def _template_classes():
+    """Define the docxtpl and Jinja subclasses, importing both libraries on first use."""
+    from docxtpl import DocxTemplate
+    from jinja2 import Environment
+
+    class CompilingEnvironment(Environment):
+        """Jinja environment that compiles each distinct template source only once."""
+
+        def __init__(self):
+            super().__init__()
+            self._compiled = {}
+
+        def from_string(self, source, globals=None, template_class=None):
+            if globals is not None or template_class is not None:
+                return super().from_string(source, globals, template_class)
+
+            template = self._compiled.get(source)
+            if template is None:
+                template = self._compiled[source] = super().from_string(source)
+            return template
+
+    class CachedDocxTemplate(DocxTemplate):
+        """DocxTemplate reusing patched XML from the cache entry it was created from."""
+
+        def __init__(self, template_file, patched_xml: Dict[str, str]):
+            super().__init__(template_file)
+            self._patched_xml = patched_xml
+
+        def patch_xml(self, src_xml):
+            patched = self._patched_xml.get(src_xml)
+            if patched is None:
+                patched = self._patched_xml[src_xml] = super().patch_xml(src_xml)
+            return patched
+
+    return CompilingEnvironment, CachedDocxTemplate
+
+
+class TemplateEntry:
+    """Template file contents together with its compiled Jinja templates."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.sha256 = hashlib.sha256(data).hexdigest()
+        environment_class, _ = _template_classes()
+        self.jinja_env = environment_class()
+        self.patched_xml = {}
+
+    def render(self, context: dict) -> "DocxTemplate":
+        """Render a fresh document from the in-memory copy of the template."""
+        _, template_class = _template_classes()
+        doc = template_class(io.BytesIO(self.data), self.patched_xml)
+        doc.render(context, self.jinja_env)
+        return doc
+
+
+class TemplateCache:
+    """Template entries keyed by path, reloaded only when the file on disk changes."""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int], TemplateEntry]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_path: str) -> TemplateEntry:
+        """Get the cache entry for a template, loading it on first use or after a change."""
+        path = os.path.abspath(template_path)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        with open(path, 'rb') as template_file:
+            entry = TemplateEntry(template_file.read())
+
+        with self._lock:
+            self._entries[path] = (version, entry)
+        return entry
+
+    def render(self, template_path: str, context: dict) -> "DocxTemplate":
+        """Render a contract document from the cached template."""
+        return self.get(template_path).render(context)
+
+    def clear(self):
+        """Drop all cached templates."""
+        with self._lock:
+            self._entries.clear()
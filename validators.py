@@ -2,8 +2,50 @@
 """Validation functions for the Contract Generator."""
 
 from typing import List, Dict
+from dataclasses import dataclass, field
 import os
 from contract_data import ContractData
+from config import GMINA_POSTAL_CODES, MAIN_LOCATIONS, REFERENCE_DATA
+from normalization import normalize, normalize_nip
+
+NIP_WEIGHTS = (6, 5, 7, 2, 3, 4, 5, 6, 7)
+
+# Columns checked by validate_table, keyed like the template variables
+REQUIRED_COLUMNS = ("data", "gmina", "nazwa", "kod_pocztowy", "numer_domu")
+
+
+def is_valid_nip(nip: str) -> bool:
+    """Check the NIP length and checksum."""
+    digits = normalize_nip(nip)
+    if len(digits) != 10:
+        return False
+    checksum = sum(int(digit) * weight for digit, weight in zip(digits, NIP_WEIGHTS)) % 11
+    return checksum != 10 and checksum == int(digits[9])
+
+
+@dataclass
+class ValidationIssue:
+    """Single failed check in a table row."""
+    row: int
+    field: str
+    message: str
+
+
+@dataclass
+class ValidationReport:
+    """All failed checks of a table."""
+    row_count: int
+    issues: List[ValidationIssue] = field(default_factory=list)
+
+    @property
+    def is_valid(self) -> bool:
+        """True when no check failed."""
+        return not self.issues
+
+    @property
+    def invalid_rows(self) -> set:
+        """Row numbers with at least one failed check."""
+        return {issue.row for issue in self.issues}
 
 
 class ContractValidator:
@@ -47,3 +89,57 @@ class ContractValidator:
                 f"Dozwolone kody: {', '.join(allowed_codes)}"
             )
         return True
+
+    @staticmethod
+    def validate_table(columns: Dict[str, List[str]], first_row: int = 2) -> ValidationReport:
+        """Validate a whole table column by column and report every failing row and field.
+
+        Rows are numbered from ``first_row`` (2 for a file with a header row).
+        """
+        row_count = max((len(values) for values in columns.values()), default=0)
+        report = ValidationReport(row_count)
+        issues = []
+
+        def column(name: str) -> List[str]:
+            values = columns.get(name) or []
+            return list(values) + [""] * (row_count - len(values))
+
+        for name in REQUIRED_COLUMNS:
+            issues.extend(ValidationIssue(index + first_row, name, "Pole jest wymagane")
+                          for index, value in enumerate(column(name)) if not value)
+
+        allowed_postal = {(gmina, code) for gmina, codes in GMINA_POSTAL_CODES.items() for code in codes}
+        gminas = column("gmina")
+        issues.extend(
+            ValidationIssue(index + first_row, "kod_pocztowy",
+                            f"Nieprawidłowy kod pocztowy dla gminy {gmina}")
+            for index, (gmina, code) in enumerate(zip(gminas, column("kod_pocztowy")))
+            if gmina and code and (gmina, code) not in allowed_postal
+        )
+
+        # Checks below are evaluated once per distinct value
+        nips = column("nip")
+        invalid_nips = {nip for nip in set(nips) if nip and not is_valid_nip(nip)}
+        issues.extend(
+            ValidationIssue(index + first_row, "nip", "Nieprawidłowy NIP")
+            for index, nip in enumerate(nips) if nip in invalid_nips
+        )
+
+        pairs = list(zip(gminas, column("miejscowosc")))
+        invalid_pairs = {pair for pair in set(pairs)
+                         if all(pair) and not ContractValidator.is_gmina_location(*pair)}
+        issues.extend(
+            ValidationIssue(index + first_row, "miejscowosc",
+                            f"Miejscowość {pair[1]} nie należy do gminy {pair[0]}")
+            for index, pair in enumerate(pairs) if pair in invalid_pairs
+        )
+
+        report.issues = sorted(issues, key=lambda issue: issue.row)
+        return report
+
+    @staticmethod
+    def is_gmina_location(gmina: str, location: str) -> bool:
+        """Check whether a locality belongs to the gmina."""
+        if REFERENCE_DATA.location_index.canonical(gmina, location):
+            return True
+        return normalize(location) == normalize(MAIN_LOCATIONS.get(gmina, ""))
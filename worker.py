@@ -0,0 +1,69 @@
+# worker.py
+"""Background execution of contract generation jobs for the Tk interface."""
+
+import queue
+import threading
+from typing import Any, Callable
+
+POLL_INTERVAL_MS = 100
+
+
+class GenerationWorker:
+    """Runs jobs one at a time on a background thread and reports back on the Tk thread.
+
+    Tk widgets may only be touched from the main thread, so results are put on
+    a queue that is drained with ``root.after`` and handed to the callbacks there.
+    """
+
+    def __init__(self, root, on_done: Callable[[Any], None], on_error: Callable[[Exception], None],
+                 on_pending: Callable[[int], None] = None):
+        self.root = root
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_pending = on_pending
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._pending = 0
+        self._thread = threading.Thread(target=self._run, name="contract-worker", daemon=True)
+        self._thread.start()
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    @property
+    def pending(self) -> int:
+        """Number of submitted jobs that have not been reported yet."""
+        return self._pending
+
+    def submit(self, job: Callable[[], Any], on_error: Callable[[Exception], None] = None):
+        """Queue a job, optionally with its own error callback; must be called from the Tk thread."""
+        self._pending += 1
+        self._notify_pending()
+        self._jobs.put((job, on_error))
+
+    def _run(self):
+        """Execute queued jobs on the background thread."""
+        while True:
+            job, on_error = self._jobs.get()
+            try:
+                self._results.put((True, job(), None))
+            except Exception as e:
+                self._results.put((False, e, on_error))
+
+    def _poll(self):
+        """Deliver finished jobs to the callbacks on the Tk thread."""
+        try:
+            while True:
+                ok, result, on_error = self._results.get_nowait()
+                self._pending -= 1
+                self._notify_pending()
+                if ok:
+                    self.on_done(result)
+                else:
+                    (on_error or self.on_error)(result)
+        except queue.Empty:
+            pass
+        self.root.after(POLL_INTERVAL_MS, self._poll)
+
+    def _notify_pending(self):
+        """Report the number of outstanding jobs."""
+        if self.on_pending:
+            self.on_pending(self._pending)